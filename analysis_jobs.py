@@ -0,0 +1,144 @@
+import json
+import os
+import re
+import time
+import uuid
+from flask import Blueprint, Response, jsonify, stream_with_context
+import analysis_pool
+import metrics
+from atomic_files import write_json
+
+# Job state lives on disk so any web worker can answer a poll for any job
+JOBS_DIR = os.path.join('cache', 'analysis_jobs')
+
+# Finished jobs are kept this many seconds before they are cleaned up
+JOB_TTL = int(os.environ.get('ANALYSIS_JOB_TTL', '600'))
+
+# A job still pending this long after it was submitted is reported as timed out, since its
+# analysis hung or the web worker that owns it died; the default leaves room for queueing
+JOB_TIMEOUT = float(os.environ.get('ANALYSIS_JOB_TIMEOUT', str(analysis_pool.ANALYSIS_TIMEOUT * 2)))
+
+# How often the events stream checks for a result, in seconds
+POLL_INTERVAL = 0.25
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# An events stream holds its request for the whole analysis, which only costs a greenlet
+# under gevent; sync and threaded workers would tie up a thread, so clients poll instead
+EVENTS_ENABLED = os.environ.get('GUNICORN_WORKER_CLASS', 'sync') == 'gevent'
+
+jobs_bp = Blueprint('analysis_jobs', __name__)
+
+_last_cleanup = 0
+
+def _job_path(job_id):
+    return os.path.join(JOBS_DIR, f'{job_id}.json')
+
+def _write_job(job_id, state):
+    # Write atomically so pollers never read a partial file
+    write_json(_job_path(job_id), state)
+
+def get_job(job_id):
+    """Return the stored state of a job, or None if it doesn't exist.
+
+    A job that has been pending for longer than JOB_TIMEOUT is returned as an error.
+    """
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            job = json.load(f)
+    except FileNotFoundError:
+        return None
+    if job['status'] == 'pending' and time.time() - job.get('submitted', 0) > JOB_TIMEOUT:
+        return {'status': 'error', 'error': 'Analysis timed out'}
+    return job
+
+def cleanup_jobs():
+    """Remove job files older than JOB_TTL, at most once a minute."""
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < 60 or not os.path.isdir(JOBS_DIR):
+        return
+    _last_cleanup = now
+    for entry in os.scandir(JOBS_DIR):
+        try:
+            if now - entry.stat().st_mtime > JOB_TTL:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+def submit_job(fn, *args):
+    """Queue fn(*args) on the analysis pool and return a job id for polling.
+
+    Raises analysis_pool.PoolBusy when the queue is full.
+    """
+    cleanup_jobs()
+    job_id = uuid.uuid4().hex
+    _write_job(job_id, {'status': 'pending', 'submitted': time.time()})
+
+    def finish(future):
+        try:
+            _write_job(job_id, {'status': 'done', 'result': metrics.record_analysis(future.result())})
+        except Exception as e:
+            print(f"Error in analysis job {job_id}: {str(e)}")
+            metrics.record_analysis_error(e)
+            _write_job(job_id, {'status': 'error', 'error': str(e)})
+
+    if analysis_pool.ANALYSIS_WORKERS <= 0:
+        try:
+            _write_job(job_id, {'status': 'done', 'result': metrics.record_analysis(fn(*args))})
+        except Exception as e:
+            metrics.record_analysis_error(e)
+            _write_job(job_id, {'status': 'error', 'error': str(e)})
+    else:
+        analysis_pool.submit(fn, *args).add_done_callback(finish)
+    return job_id
+
+def job_accepted(job_id):
+    """Build the 202 response returned when a job is submitted."""
+    job = {
+        'job_id': job_id,
+        'status': 'pending',
+        'status_url': f'/api/analysis/{job_id}',
+        'timeout': JOB_TIMEOUT
+    }
+    if EVENTS_ENABLED:
+        job['events_url'] = f'/api/analysis/{job_id}/events'
+    response = jsonify(job)
+    response.headers['Location'] = f'/api/analysis/{job_id}'
+    return response, 202
+
+@jobs_bp.route('/api/analysis/<job_id>')
+def analysis_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown analysis job'}), 404
+    return jsonify(job)
+
+@jobs_bp.route('/api/analysis/<job_id>/events')
+def analysis_events(job_id):
+    if not EVENTS_ENABLED:
+        return jsonify({'error': 'Event streams are only available with gevent workers; poll the status URL'}), 404
+    if get_job(job_id) is None:
+        return jsonify({'error': 'Unknown analysis job'}), 404
+
+    def events():
+        # get_job reports the job as timed out once JOB_TIMEOUT has passed since it was
+        # submitted, so a queued job isn't given up on early and a lost one ends the stream
+        last_ping = 0
+        while True:
+            job = get_job(job_id)
+            if job is None or job['status'] != 'pending':
+                yield f"event: result\ndata: {json.dumps(job or {'status': 'error', 'error': 'Job expired'})}\n\n"
+                return
+            # Comment lines keep the connection alive through proxies
+            if time.time() - last_ping >= 15:
+                last_ping = time.time()
+                yield ': pending\n\n'
+            time.sleep(POLL_INTERVAL)
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
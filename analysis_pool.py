@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+def _default_workers():
+    # Split the CPUs this process may run on between the gunicorn workers, so the whole
+    # server runs about one analysis per CPU however many web workers there are
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(1, cpus // int(os.environ.get('WEB_CONCURRENCY', '2')))
+
+# Number of analysis processes per web worker (0 runs analysis inline in the request thread)
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', str(_default_workers())))
+
+# Maximum number of analyses queued or running before new requests are turned away
+ANALYSIS_QUEUE_SIZE = int(os.environ.get('ANALYSIS_QUEUE_SIZE', str(max(ANALYSIS_WORKERS, 1) * 4)))
+
+# Seconds a request waits for its analysis before giving up
+ANALYSIS_TIMEOUT = float(os.environ.get('ANALYSIS_TIMEOUT', '30'))
+
+# Seconds clients are asked to wait before retrying when the queue is full
+RETRY_AFTER = int(os.environ.get('ANALYSIS_RETRY_AFTER', '2'))
+
+class PoolBusy(Exception):
+    """Raised when the analysis queue is full."""
+
+class AnalysisTimeout(Exception):
+    """Raised when an analysis doesn't finish within its timeout."""
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+_reference_dirs = []
+
+# Modules the analysis processes need, imported once by the forkserver they fork from
+PRELOAD_MODULES = ['scipy.signal', 'scoring', 'reference_features', 'reference_bank']
+
+def warm_up(reference_dirs=None):
+    """Import the DSP stack, load reference features and run one analysis in this process."""
+    import scoring
+    from reference_features import build_reference_store
+    for sounds_dir in (_reference_dirs if reference_dirs is None else reference_dirs):
+        build_reference_store(sounds_dir)
+    scoring.warm_up()
+
+def _init_worker(reference_dirs):
+    warm_up(reference_dirs)
+
+def configure(reference_dirs):
+    """Set the reference sound directories each analysis process preloads."""
+    _reference_dirs[:] = reference_dirs
+
+def _mp_context():
+    # Never fork the multi-threaded web worker itself. A forkserver is a clean single-threaded
+    # process that imports the DSP stack once, so each analysis process forks from it warm
+    # instead of starting a new interpreter; spawn is the fallback where forkserver is missing
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+def get_pool():
+    """Return the analysis pool, starting it on first use in this process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                mp_context=_mp_context(),
+                initializer=_init_worker,
+                initargs=(list(_reference_dirs),)
+            )
+        return _pool
+
+def _reset_pool(broken_pool):
+    global _pool
+    with _pool_lock:
+        if _pool is broken_pool:
+            _pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+def queue_depth():
+    """Return the number of analyses currently queued or running."""
+    return _in_flight
+
+def _acquire_slot():
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= ANALYSIS_QUEUE_SIZE:
+            raise PoolBusy('Analysis queue is full')
+        _in_flight += 1
+
+def _release_slot(*_):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+def submit(fn, *args):
+    """Queue fn(*args) on the analysis pool and return its future.
+
+    Raises PoolBusy without queueing anything when the queue is full.
+    """
+    _acquire_slot()
+    try:
+        pool = get_pool()
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died; replace the pool and retry once
+            _reset_pool(pool)
+            future = get_pool().submit(fn, *args)
+    except BaseException:
+        _release_slot()
+        raise
+
+    # The slot is held until the job actually finishes, even if the caller timed out
+    future.add_done_callback(_release_slot)
+    return future
+
+def run_analysis(fn, *args, timeout=ANALYSIS_TIMEOUT):
+    """Run fn(*args) on the analysis pool and wait for its result."""
+    if ANALYSIS_WORKERS <= 0:
+        return fn(*args)
+
+    future = submit(fn, *args)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        # A running job can't be interrupted; cancel it if it hasn't started yet
+        future.cancel()
+        raise AnalysisTimeout(f'Analysis did not finish within {timeout} seconds')
+
+def start(wait=True):
+    """Start the pool and its workers ahead of the first request.
+
+    With wait=False the workers spawn in the background and early jobs queue until they are up.
+    """
+    if ANALYSIS_WORKERS <= 0:
+        return
+
+    def spawn_workers():
+        pool = get_pool()
+        # Submitting no-op jobs forces every worker to spawn and run its initializer
+        return [pool.submit(int) for _ in range(ANALYSIS_WORKERS)]
+
+    if wait:
+        for future in spawn_workers():
+            future.result()
+    else:
+        # Starting a process waits for the forkserver to come up, so do it off this thread
+        threading.Thread(target=spawn_workers, name='analysis-pool-start', daemon=True).start()
@@ -1,11 +1,21 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, render_template, jsonify, request
 import os
-import random
-import soundfile as sf
-import numpy as np
-from datetime import datetime
+import time
+import analysis_pool
+import metrics
+from analysis_jobs import job_accepted, jobs_bp, submit_job
+from analysis_pool import AnalysisTimeout, PoolBusy, RETRY_AFTER, run_analysis
+from catalog import EXTRA_ANIMALS_PATH, AnimalCatalog, clean_filename, list_files, load_extra_animals
+from image_derivatives import IMAGE_SIZES, image_sources, load_manifest as load_image_manifest
+from recordings_index import RECORDINGS_DIR, InvalidCursor, add_recording, list_recordings
+from renditions import available_formats, choose_rendition
+from static_assets import asset_url, load_build_manifest, send_asset, send_prebuilt
+from werkzeug.exceptions import ClientDisconnected
+from uploads import IncompleteUpload, MAX_UPLOAD_BYTES, UploadTooLarge, save_stream, unique_filename
 
 app = Flask(__name__, static_folder='static', static_url_path='/static')
+app.register_blueprint(jobs_bp)
+metrics.init_app(app)
 
 # Dictionary mapping animal names to their categories and descriptions
 MARINE_ANIMALS = {
@@ -121,95 +131,131 @@ MARINE_ANIMALS = {
     }
 }
 
-def clean_filename(name):
-    """Convert animal name to a clean filename."""
-    # Remove special characters and replace spaces with underscores
-    name = name.lower()
-    name = name.replace("'", "")  # Remove apostrophes
-    name = name.replace(" ", "_")
-    return name
+def find_reference_sound(animal):
+    """Return the path of the reference sound for an animal, or None if there isn't one."""
+    sound_file = f'processed_{clean_filename(animal)}.wav'
+    for sounds_dir in REFERENCE_SOUND_DIRS:
+        path = os.path.join(sounds_dir, sound_file)
+        if os.path.exists(path):
+            return path
+    return None
+
+# Pages prebuilt by build_static.py; templates are only rendered per request in debug
+BUILD_MANIFEST = load_build_manifest()
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    if app.debug or 'index.html' not in BUILD_MANIFEST:
+        return render_template('index.html')
+    return send_prebuilt('build', 'index.html', BUILD_MANIFEST['index.html'])
 
-@app.route('/get_random_animal')
-def get_random_animal():
-    # Get list of available images
+def build_animal_entries():
+    """Build the catalog entries for every animal that has an image, plus ingested species with a sound."""
     images_dir = os.path.join('static', 'images')
-    available_images = set()
-    if os.path.exists(images_dir):
-        for filename in os.listdir(images_dir):
-            if filename.endswith('.jpg'):
-                available_images.add(filename.replace('.jpg', ''))
+    sounds_dir = os.path.join('static', 'sounds')
+    available_images = {filename[:-len('.jpg')] for filename in list_files(images_dir, '.jpg')}
+    available_sounds = list_files(sounds_dir, '.wav')
+    rendition_files = list_files(RENDITIONS_SOUND_DIR, '')
+    derivatives = load_image_manifest()
     
-    # Filter animals to only those with images
-    available_animals = []
-    for animal in MARINE_ANIMALS.keys():
-        clean_name = clean_filename(animal)
-        if clean_name in available_images:
-            available_animals.append(animal)
+    # Built-in descriptions win over ingested ones for the same animal
+    extra_animals = load_extra_animals()
+    animals = dict(extra_animals, **MARINE_ANIMALS)
     
-    if not available_animals:
+    entries = []
+    for animal, animal_info in animals.items():
+        clean_name = clean_filename(animal)
+        has_image = clean_name in available_images
+        if not has_image and not (animal in extra_animals and f'processed_{clean_name}.wav' in available_sounds):
+            continue
+        entries.append({
+            'animal': animal,
+            'category': animal_info['category'],
+            'description': animal_info['description'],
+            'sound_file': f'processed_{clean_name}.wav',
+            'sound_url': asset_url('/static/sounds', sounds_dir, f'processed_{clean_name}.wav'),
+            'sound_formats': available_formats(f'processed_{clean_name}', rendition_files),
+            'image_file': f'{clean_name}.jpg' if has_image else None,
+            'image_url': asset_url('/static/images', images_dir, f'{clean_name}.jpg') if has_image else None,
+            'image_sources': image_sources(clean_name, derivatives),
+            'image_sizes': IMAGE_SIZES
+        })
+    return entries
+
+# Reference sounds, in lookup order. Their features are loaded by the analysis processes
+# (or on first use when analyzing inline), so the web worker never imports the DSP stack
+REFERENCE_SOUND_DIRS = [os.path.join('static', 'sounds'), os.path.join('static', 'sounds', 'processed')]
+analysis_pool.configure(REFERENCE_SOUND_DIRS)
+
+# Catalog of servable animals, built once and refreshed when the media directories change
+RENDITIONS_SOUND_DIR = os.path.join('static', 'sounds', 'renditions')
+catalog = AnimalCatalog(build_animal_entries, watch_dirs=[
+    os.path.join('static', 'images'), os.path.join('static', 'images', 'derivatives'),
+    os.path.join('static', 'sounds'), RENDITIONS_SOUND_DIR, EXTRA_ANIMALS_PATH
+])
+CATALOG_POLL_INTERVAL = int(os.environ.get('CATALOG_POLL_INTERVAL', '30'))
+if CATALOG_POLL_INTERVAL > 0:
+    catalog.start_watcher(CATALOG_POLL_INTERVAL)
+
+@app.route('/get_random_animal')
+def get_random_animal():
+    picked = catalog.random_entry()
+    if picked is None:
         return jsonify({'error': 'No animals with images available'}), 500
     
-    animal = random.choice(available_animals)
-    animal_info = MARINE_ANIMALS[animal]
-    return jsonify({
-        'animal': animal,
-        'category': animal_info['category'],
-        'description': animal_info['description'],
-        'sound_file': f'processed_{clean_filename(animal)}.wav',
-        'image_file': f'{clean_filename(animal)}.jpg'
-    })
+    _, payload = picked
+    return app.response_class(payload, mimetype='application/json')
+
+@app.route('/api/catalog/reload', methods=['POST'])
+def reload_catalog():
+    try:
+        count = catalog.reload()
+        return jsonify({'success': True, 'animals': count})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/save_recording', methods=['POST'])
 def save_recording():
     try:
-        audio_data = request.get_data()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'recording_{timestamp}.wav'
-        
-        # Create recordings directory if it doesn't exist
-        os.makedirs('recordings', exist_ok=True)
+        # Reject oversized uploads up front when the client declares a length
+        if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+            return jsonify({'success': False, 'error': 'Recording is too large'}), 413
         
-        # Save the recording
-        with open(os.path.join('recordings', filename), 'wb') as f:
-            f.write(audio_data)
+        # Stream the body to disk in chunks instead of buffering it in memory
+        filename = unique_filename('recording', '.wav')
+        size = save_stream(request.stream, RECORDINGS_DIR, filename, expected_bytes=request.content_length)
+        metrics.observe_upload(size, '/save_recording')
+        add_recording(filename, size, time.time())
         
         return jsonify({'success': True, 'filename': filename})
+    except UploadTooLarge:
+        return jsonify({'success': False, 'error': 'Recording is too large'}), 413
+    except (IncompleteUpload, ClientDisconnected):
+        # The raw stream (gunicorn) comes up short; Werkzeug's LimitedStream raises instead
+        return jsonify({'success': False, 'error': 'Recording upload was interrupted'}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/get_recordings')
 def get_recordings():
     try:
-        recordings_dir = 'recordings'
-        if not os.path.exists(recordings_dir):
-            return jsonify([])
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        cursor = request.args.get('cursor')
         
-        recordings = []
-        for filename in os.listdir(recordings_dir):
-            if filename.endswith('.wav'):
-                filepath = os.path.join(recordings_dir, filename)
-                # Get file size and creation time
-                size = os.path.getsize(filepath)
-                created = datetime.fromtimestamp(os.path.getctime(filepath))
-                recordings.append({
-                    'filename': filename,
-                    'size': size,
-                    'created': created.strftime('%Y-%m-%d %H:%M:%S')
-                })
-        
-        # Sort by creation time, newest first
-        recordings.sort(key=lambda x: x['created'], reverse=True)
-        return jsonify(recordings)
+        # Newest first, one page at a time from the metadata index
+        recordings, next_cursor = list_recordings(limit=limit, cursor=cursor)
+        return jsonify({'recordings': recordings, 'next_cursor': next_cursor})
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor; pass the next_cursor value from a previous page'}), 400
     except Exception as e:
         return jsonify({'error': str(e)})
 
 @app.route('/api/analyze_recording', methods=['POST'])
 def analyze_recording():
     try:
+        # Same limit as saved recordings; checked up front when the client declares a length
+        if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+            return jsonify({'error': 'Recording is too large'}), 413
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
         
@@ -219,24 +265,34 @@ def analyze_recording():
         if not target_animal:
             return jsonify({'error': 'No target animal specified'}), 400
         
-        # Read the audio file data
-        audio_data = audio_file.read()
-        file_size = len(audio_data)
-        
-        # Implement a more robust scoring mechanism
-        if file_size == 0:
+        # Read the audio file data, never more than the limit
+        audio_data = audio_file.read(MAX_UPLOAD_BYTES + 1)
+        if len(audio_data) > MAX_UPLOAD_BYTES:
+            return jsonify({'error': 'Recording is too large'}), 413
+        if len(audio_data) == 0:
             return jsonify({'score': 0, 'feedback': "No audio data provided."}), 400
+        metrics.observe_upload(len(audio_data), '/api/analyze_recording')
         
-        # Example scoring logic based on file size
-        score = min(100, int(file_size / 1000))  # Simple scoring based on file size
+        reference_path = find_reference_sound(target_animal)
+        if reference_path is None:
+            return jsonify({'error': 'Unknown animal'}), 404
         
-        feedback = "Great job!" if score > 80 else "Try again!" if score > 50 else "Keep practicing!"
+        from scoring import score_audio
         
-        return jsonify({
-            'score': score,
-            'feedback': feedback
-        })
+        # In async mode return a job id straight away and let the client poll for the result
+        if request.form.get('mode') == 'async':
+            return job_accepted(submit_job(score_audio, audio_data, reference_path))
+        
+        # Run the DSP off the request thread on the shared analysis pool
+        return jsonify(metrics.record_analysis(run_analysis(score_audio, audio_data, reference_path)))
+    except PoolBusy:
+        response = jsonify({'error': 'Too many recordings are being analyzed, please try again'})
+        response.headers['Retry-After'] = str(RETRY_AFTER)
+        return response, 503
+    except AnalysisTimeout:
+        return jsonify({'error': 'Analysis took too long, please try again'}), 504
     except Exception as e:
+        metrics.record_analysis_error(e)
         return jsonify({'error': str(e)}), 500
 
 # Add CORS headers for static files
@@ -251,10 +307,22 @@ def add_header(response):
 @app.route('/static/sounds/<path:filename>')
 def serve_sound(filename):
     try:
-        return send_from_directory('static/sounds', filename, mimetype='audio/wav')
+        # Serve a compressed rendition when the client asks for one it can play
+        path, mimetype = choose_rendition(
+            os.path.join('static', 'sounds'), filename,
+            requested_format=request.args.get('format'),
+            accept_mimetypes=request.accept_mimetypes
+        )
+        response = send_asset('static/sounds', path, mimetype=mimetype, versioned_name=filename)
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         print(f"Error serving sound file {filename}: {str(e)}")
         return jsonify({'error': 'Sound file not found'}), 404
 
+@app.route('/static/images/<path:filename>')
+def serve_image(filename):
+    return send_asset('static/images', filename)
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,23 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+def write_atomic(path, data):
+    """Write bytes to path through a temp file and a rename, so readers never see a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temp name per writer, so concurrent processes and threads never share one
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+def write_json(path, data, **kwargs):
+    """Atomically write data as JSON; kwargs are passed to json.dumps."""
+    write_atomic(path, json.dumps(data, **kwargs).encode('utf-8'))
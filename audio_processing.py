@@ -0,0 +1,78 @@
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+import soundfile as sf
+from audio_decode import decode_audio
+
+def loop_to_length(y, n_samples, crossfade=0):
+    """Loop or trim y (frames, channels) to exactly n_samples frames.
+
+    The result is written into a single preallocated buffer. With crossfade > 0
+    each repetition fades in over the tail of the previous one.
+    """
+    if len(y) == 0:
+        raise ValueError('Cannot loop an empty clip')
+    if len(y) >= n_samples:
+        return y[:n_samples].copy()
+
+    crossfade = min(crossfade, len(y) // 2)
+    out = np.empty((n_samples,) + y.shape[1:], dtype=y.dtype)
+    first = min(len(y), n_samples)
+    out[:first] = y[:first]
+    if crossfade:
+        fade_in = np.linspace(0, 1, crossfade, dtype=y.dtype).reshape((-1,) + (1,) * (y.ndim - 1))
+        fade_out = 1 - fade_in
+
+    step = len(y) - crossfade
+    pos = step
+    while pos < n_samples:
+        if crossfade:
+            overlap = min(crossfade, n_samples - pos)
+            out[pos:pos + overlap] = out[pos:pos + overlap] * fade_out[:overlap] + y[:overlap] * fade_in[:overlap]
+        end = min(pos + len(y), n_samples)
+        out[pos + crossfade:end] = y[crossfade:end - pos]
+        pos += step
+    return out
+
+def normalize_loudness(y, target_dbfs=-20.0):
+    """Scale y so its RMS level is target_dbfs, without letting peaks clip."""
+    rms = np.sqrt(np.mean(np.square(y, dtype=np.float64)))
+    if rms == 0:
+        return y
+    gain = 10 ** (target_dbfs / 20) / rms
+    peak = np.max(np.abs(y))
+    gain = min(gain, 0.999 / peak)
+    return (y * gain).astype(y.dtype)
+
+def set_channels(y, channels):
+    """Mix down or duplicate channels of y (frames, channels) to the given count."""
+    if y.shape[1] == channels:
+        return y
+    if channels == 1:
+        return y.mean(axis=1, keepdims=True)
+    return np.repeat(y.mean(axis=1, keepdims=True), channels, axis=1)
+
+def write_audio(output_file, y, sr, subtype='PCM_16'):
+    """Write a WAV file atomically via a temp file in the same directory."""
+    output_file = Path(output_file)
+    fd, tmp_path = tempfile.mkstemp(dir=output_file.parent, prefix='.processing-', suffix='.wav')
+    os.close(fd)
+    try:
+        sf.write(tmp_path, y, sr, subtype=subtype, format='WAV')
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+def process_to_duration(input_file, output_file, duration_ms=5000, sample_rate=None, channels=None,
+                        normalize_dbfs=None, crossfade_ms=0):
+    """Decode a clip, loop/trim it to duration_ms and write it as a 16-bit WAV."""
+    y, sr = decode_audio(input_file, sr=sample_rate, mono=False)
+    if channels:
+        y = set_channels(y, channels)
+    y = loop_to_length(y, int(sr * duration_ms / 1000), crossfade=int(sr * crossfade_ms / 1000))
+    if normalize_dbfs is not None:
+        y = normalize_loudness(y, normalize_dbfs)
+    write_audio(output_file, y, sr)
@@ -0,0 +1,238 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+
+# Analysis runs inline and background threads stay off, so timings measure the code itself
+os.environ.setdefault('ANALYSIS_WORKERS', '0')
+os.environ.setdefault('CATALOG_POLL_INTERVAL', '0')
+os.environ.setdefault('ARCHIVE_RECORDINGS', '0')
+
+import numpy as np
+import soundfile as sf
+
+BASELINE_PATH = Path('benchmark_baseline.json')
+
+# A benchmark fails if its median time or peak memory grows by more than this fraction
+DEFAULT_THRESHOLD = 0.25
+
+# Differences below these are noise, whatever the percentage
+MIN_TIME_DELTA_MS = 0.2
+MIN_MEMORY_DELTA_KB = 64
+
+# Synthetic clip lengths (seconds) and sample rates
+LENGTHS = [1, 5, 15]
+SAMPLE_RATES = [16000, 44100, 48000]
+
+def synthetic_clip(seconds, sr, seed=0):
+    """Deterministic test signal: a rising chirp gated into 4 Hz pulses, plus a little noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    phase = 2 * np.pi * (300 * t + 600 * t * t / seconds)
+    gate = (np.sin(2 * np.pi * 4 * t) > 0).astype(np.float64)
+    y = 0.4 * gate * np.sin(phase) + 0.01 * rng.standard_normal(len(t))
+    return y.astype(np.float32)
+
+def wav_bytes(y, sr):
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format='WAV', subtype='PCM_16')
+    return buf.getvalue()
+
+def measure(fn, repeat=10, warmup=1):
+    """Time fn over repeat runs and record its peak Python allocation on one more run."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'median_ms': round(statistics.median(times) * 1000, 3),
+        'min_ms': round(min(times) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+def audio_benchmarks(work_dir):
+    """Decode, feature and scoring stages, then the whole scoring call, for every fixture."""
+    from audio_decode import ANALYSIS_SR, decode_audio
+    from reference_features import extract_features, get_reference_features
+    from scoring import compare_features, score_audio
+
+    reference_path = work_dir / 'processed_reference.wav'
+    sf.write(reference_path, synthetic_clip(5, 44100, seed=1), 44100, subtype='PCM_16')
+    reference = get_reference_features(reference_path)
+
+    benchmarks = {}
+    for sr in SAMPLE_RATES:
+        for seconds in LENGTHS:
+            name = f'{seconds}s@{sr}'
+            data = wav_bytes(synthetic_clip(seconds, sr), sr)
+            y, _ = decode_audio(data, sr=ANALYSIS_SR)
+            user = extract_features(y[:reference['length']], ANALYSIS_SR)
+            benchmarks[f'decode/{name}'] = partial(decode_audio, data, sr=ANALYSIS_SR)
+            benchmarks[f'features/{name}'] = partial(extract_features, y, ANALYSIS_SR)
+            benchmarks[f'compare/{name}'] = partial(compare_features, reference, user)
+            benchmarks[f'score_audio/{name}'] = partial(score_audio, data, reference_path)
+    return benchmarks
+
+def processing_benchmarks(work_dir):
+    from process_sounds import process_sound_file
+
+    benchmarks = {}
+    for seconds in [1, 15]:
+        source = work_dir / f'source_{seconds}s.wav'
+        sf.write(source, synthetic_clip(seconds, 44100), 44100, subtype='PCM_16')
+        benchmarks[f'process_sound_file/{seconds}s@44100'] = partial(
+            process_sound_file, source, work_dir / f'processed_{seconds}s.wav')
+    return benchmarks
+
+def app_benchmarks(work_dir):
+    """Catalog and upload routes of app.py, with recordings written to a scratch directory."""
+    import app
+    import recordings_index
+
+    db_path = str(work_dir / 'index.sqlite3')
+    app.RECORDINGS_DIR = str(work_dir / 'recordings')
+    app.add_recording = partial(recordings_index.add_recording, db_path=db_path)
+    app.list_recordings = partial(recordings_index.list_recordings, db_path=db_path)
+
+    client = app.app.test_client()
+    recording = wav_bytes(synthetic_clip(5, 48000), 48000)
+    animal = app.catalog.entries()[0]['animal']
+
+    def analyze():
+        return client.post('/api/analyze_recording', data={
+            'audio': (io.BytesIO(recording), 'recording.wav'), 'animal': animal
+        })
+
+    return {
+        'app.build_animal_entries': app.build_animal_entries,
+        'app.get_random_animal': partial(client.get, '/get_random_animal'),
+        'app.save_recording/5s@48000': partial(client.post, '/save_recording', data=recording),
+        'app.get_recordings': partial(client.get, '/get_recordings?limit=50'),
+        'app.analyze_recording/5s@48000': analyze
+    }
+
+def main_benchmarks(work_dir):
+    """Catalog and analysis paths of main.py."""
+    import main
+
+    client = main.app.test_client()
+    recording = wav_bytes(synthetic_clip(5, 48000), 48000)
+    animal = main.catalog.entries()[0]
+    reference_path = os.path.join('static', 'sounds', 'processed',
+                                  f'processed_{animal["name"].lower().replace(" ", "_")}.wav')
+    with client.session_transaction() as session:
+        session['current_animal'] = animal
+
+    def analyze():
+        return client.post('/api/analyze_recording', data={'audio': (io.BytesIO(recording), 'recording.wav')})
+
+    return {
+        'main.get_available_animals': main.get_available_animals,
+        'main.random_animal': partial(client.get, '/api/random-animal'),
+        'main.analyze_audio/5s@48000': partial(main.analyze_audio, reference_path, recording),
+        'main.analyze_recording/5s@48000': analyze
+    }
+
+SUITES = {
+    'audio': audio_benchmarks,
+    'processing': processing_benchmarks,
+    'app': app_benchmarks,
+    'main': main_benchmarks
+}
+
+def run(suites, name_filter=None, repeat=10):
+    import reference_features
+
+    results = {}
+    cache_dir = reference_features.CACHE_DIR
+    with tempfile.TemporaryDirectory(prefix='benchmarks-') as tmp:
+        # Features of the scratch clips are cached in the scratch directory, not in cache/
+        reference_features.CACHE_DIR = Path(tmp) / 'reference_features'
+        try:
+            for suite in suites:
+                work_dir = Path(tmp) / suite
+                work_dir.mkdir()
+                # The code under test prints progress; keep it out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    benchmarks = SUITES[suite](work_dir)
+                for name, fn in benchmarks.items():
+                    if name_filter and name_filter not in name:
+                        continue
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        results[name] = measure(fn, repeat=repeat)
+                    print(f"{name:<40} {results[name]['median_ms']:>10.3f} ms  {results[name]['peak_kb']:>10.1f} KB")
+        finally:
+            reference_features.CACHE_DIR = cache_dir
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return a list of regression messages for results that got slower or bigger than the baseline."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        time_limit = max(base['median_ms'] * (1 + threshold), base['median_ms'] + MIN_TIME_DELTA_MS)
+        if result['median_ms'] > time_limit:
+            regressions.append(f"{name}: {result['median_ms']:.3f} ms vs baseline {base['median_ms']:.3f} ms")
+        memory_limit = max(base['peak_kb'] * (1 + threshold), base['peak_kb'] + MIN_MEMORY_DELTA_KB)
+        if result['peak_kb'] > memory_limit:
+            regressions.append(f"{name}: peak {result['peak_kb']:.1f} KB vs baseline {base['peak_kb']:.1f} KB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the audio and catalog hot paths.')
+    parser.add_argument('--suite', dest='suites', action='append', choices=list(SUITES), help='suite to run (repeatable; default: all)')
+    parser.add_argument('-k', dest='name_filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs per benchmark')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed slowdown, e.g. 0.25 for 25%%')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    results = run(args.suites or list(SUITES), args.name_filter, args.repeat)
+
+    if args.save:
+        baseline = {}
+        if args.baseline.exists():
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nSaved {len(results)} results to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import gzip
+import hashlib
+import json
+from pathlib import Path
+from flask import Flask, render_template
+from atomic_files import write_atomic
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Prebuilt pages served in production instead of rendering templates per request
+BUILD_DIR = Path('build')
+
+PAGES = ['index.html']
+
+def build_page(app, template_name):
+    """Render a template once and write it with gzip and brotli variants."""
+    with app.app_context():
+        html = render_template(template_name).encode('utf-8')
+
+    target = BUILD_DIR / template_name
+    write_atomic(target, html)
+    write_atomic(target.with_name(f'{target.name}.gz'), gzip.compress(html, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_atomic(target.with_name(f'{target.name}.br'), brotli.compress(html, quality=11))
+    return hashlib.sha256(html).hexdigest()[:16]
+
+def main():
+    BUILD_DIR.mkdir(exist_ok=True)
+    app = Flask(__name__, template_folder='templates')
+    manifest = {}
+    for template_name in PAGES:
+        manifest[template_name] = build_page(app, template_name)
+        print(f"Built {BUILD_DIR / template_name}")
+    write_atomic(BUILD_DIR / 'manifest.json', json.dumps(manifest, indent=2).encode('utf-8'))
+    if brotli is None:
+        print("brotli is not installed; only gzip variants were written")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import threading
+import time
+
+def list_files(directory, suffix):
+    """Return the set of filenames in a directory ending with suffix."""
+    if not os.path.isdir(directory):
+        return set()
+    return {filename for filename in os.listdir(directory) if filename.endswith(suffix)}
+
+def clean_filename(name):
+    """Convert animal name to a clean filename."""
+    # Remove special characters and replace spaces with underscores
+    name = name.lower()
+    name = name.replace("'", "")  # Remove apostrophes
+    name = name.replace(" ", "_")
+    return name
+
+# Species added by ingest scripts (e.g. ingest_noaa.py), merged into the built-in lists
+EXTRA_ANIMALS_PATH = 'catalog_extra.json'
+
+def load_extra_animals(path=EXTRA_ANIMALS_PATH):
+    """Return {animal name: {category, description, ...}} for ingested species."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Ignoring unreadable {path}: {str(e)}")
+        return {}
+
+class AnimalCatalog:
+    """In-memory index of the animals that can be served, rebuilt only on reload.
+
+    build_entries is called with no arguments and returns a list of JSON-serializable
+    dicts, one per animal. Each entry's JSON payload is rendered once at build time so
+    the request path is a random pick from a prebuilt list. watch_dirs may also name
+    files; any change to their mtime triggers a reload.
+    """
+
+    def __init__(self, build_entries, watch_dirs=()):
+        self._build_entries = build_entries
+        self._watch_dirs = list(watch_dirs)
+        self._entries = []
+        self._signature = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.reload()
+
+    def _dir_signature(self):
+        signature = []
+        for directory in self._watch_dirs:
+            try:
+                signature.append(os.stat(directory).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def reload(self):
+        """Rebuild the catalog from disk and swap it in atomically."""
+        with self._lock:
+            signature = self._dir_signature()
+            entries = [(entry, json.dumps(entry)) for entry in self._build_entries()]
+            self._entries = entries
+            self._signature = signature
+        return len(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def entries(self):
+        return [entry for entry, _ in self._entries]
+
+    def random_entry(self):
+        """Return a random (entry, json_payload) pair, or None if the catalog is empty."""
+        entries = self._entries
+        if not entries:
+            return None
+        return random.choice(entries)
+
+    def start_watcher(self, interval=30):
+        """Poll the watched directories in the background and reload when they change."""
+        if self._watcher is not None or not self._watch_dirs:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self._dir_signature() != self._signature:
+                        count = self.reload()
+                        print(f"Catalog reloaded: {count} animals")
+                except Exception as e:
+                    print(f"Error reloading catalog: {str(e)}")
+
+        self._watcher = threading.Thread(target=watch, name='catalog-watcher', daemon=True)
+        self._watcher.start()
+
+        # Threads don't survive fork; workers forked from a preloaded app start their own
+        def restart_in_child():
+            self._lock = threading.Lock()
+            self._watcher = None
+            self.start_watcher(interval)
+
+        os.register_at_fork(after_in_child=restart_in_child)
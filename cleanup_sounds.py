@@ -1,18 +1,43 @@
-import os
+import argparse
+import sys
 from pathlib import Path
+from media_manifest import MANIFEST_PATH, SOUNDS_DIR, MediaManifest
 
-def cleanup_sounds():
-    """Clean up duplicate sound files and keep only the processed WAV files."""
-    sounds_dir = Path('static/sounds')
+def cleanup_sounds(dry_run=False):
+    """Remove files in static/sounds that the media manifest doesn't account for."""
+    manifest = MediaManifest()
+    if not manifest.exists:
+        print(f"No {MANIFEST_PATH} found; nothing is known to be safe to delete.")
+        print("Record the current files first with: python media_manifest.py adopt")
+        return False
     
-    # Keep only processed WAV files and remove others
-    for file in sounds_dir.glob('*'):
-        if file.suffix == '.mp3' or (file.suffix == '.wav' and not file.name.startswith('processed_')):
-            try:
-                file.unlink()
-                print(f"Removed: {file.name}")
-            except Exception as e:
-                print(f"Error removing {file.name}: {str(e)}")
+    keep = manifest.referenced_paths()
+    for file in sorted(Path(SOUNDS_DIR).iterdir()):
+        if not file.is_file() or str(file) in keep:
+            continue
+        if dry_run:
+            print(f"Would remove: {file.name}")
+            continue
+        try:
+            file.unlink()
+            print(f"Removed: {file.name}")
+        except Exception as e:
+            print(f"Error removing {file.name}: {str(e)}")
+    
+    # Sources that were deleted are still recorded by URL and hash
+    for key, entry in manifest.data['species'].items():
+        for kind, source in entry['sources'].items():
+            if source.get('path') and not Path(source['path']).exists():
+                manifest.forget_source_file(key, kind)
+        for kind, output in entry['outputs'].items():
+            if not Path(output['path']).exists():
+                print(f"Missing {kind} output for {key}: {output['path']}")
+    if not dry_run:
+        manifest.save()
+    return True
 
 if __name__ == '__main__':
-    cleanup_sounds() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Delete sound files not recorded in the media manifest.')
+    parser.add_argument('--dry-run', action='store_true', help='only list what would be removed')
+    args = parser.parse_args()
+    sys.exit(0 if cleanup_sounds(dry_run=args.dry_run) else 1)
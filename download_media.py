@@ -1,9 +1,12 @@
-import requests
+import argparse
 from bs4 import BeautifulSoup
 import os
 import re
-import time
 from urllib.parse import urljoin
+from fetcher import Fetcher, MIN_INTERVAL, PER_HOST_LIMIT, create_session as create_pooled_session
+from media_manifest import MediaManifest, adopt, fetch_source
+
+BASE_URL = "https://ocr.org"
 
 def setup_directories():
     """Create necessary directories for storing files."""
@@ -16,10 +19,9 @@ def clean_filename(name):
     cleaned = re.sub(r'[-\s]+', '_', cleaned)
     return cleaned.lower()
 
-def create_session():
-    """Create a session with proper headers."""
-    session = requests.Session()
-    session.headers.update({
+def create_session(pool_size=PER_HOST_LIMIT):
+    """Create a pooled session with proper headers."""
+    return create_pooled_session(pool_size=pool_size, headers={
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.9',
@@ -32,32 +34,31 @@ def create_session():
         'Sec-Fetch-User': '?1',
         'Cache-Control': 'max-age=0'
     })
-    return session
 
-def download_file(session, url, filename):
-    """Download a file from URL to the specified filename."""
-    try:
-        response = session.get(url, stream=True)
-        response.raise_for_status()
-        
-        with open(filename, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        print(f"Successfully downloaded: {filename}")
-        return True
-    except Exception as e:
-        print(f"Error downloading {filename}: {str(e)}")
+def download_image(fetcher, manifest, key, name, url):
+    """Download an image as the species' picture unless another species already has it."""
+    # The existing file lets the fetcher send conditional requests so unchanged images aren't
+    # refetched; new bytes are staged and only replace it if no other species has them
+    image_filename = f"static/images/{key}.jpg"
+    status = fetch_source(manifest, fetcher, key, 'image', url, image_filename, name=name)
+    if status in ('failed', 'duplicate'):
         return False
+    manifest.record_output(key, 'image', image_filename)
+    return True
+
+def download_sound(fetcher, manifest, key, name, url, ext):
+    """Download a raw sound file and record it as the species' source."""
+    sound_filename = f"static/sounds/{key}{ext}"
+    return fetch_source(manifest, fetcher, key, 'sound', url, sound_filename, name=name) not in ('failed', 'duplicate')
 
-def get_animal_links(session):
+def get_animal_links(fetcher, base_url=BASE_URL):
     """Get all animal links from the OCR sound library."""
     print("Getting animal links from OCR sound library...")
     animal_links = []
     
     try:
         # Get the main sound library page
-        response = session.get("https://ocr.org/sound-library/")
+        response = fetcher.get(urljoin(base_url, "/sound-library/"))
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
         
@@ -68,6 +69,7 @@ def get_animal_links(session):
             links = div.find_all('a')
             for link in links:
                 href = link.get('href')
+                href = urljoin(base_url, href) if href else href
                 if href and '/sound-library/' in href and not href.endswith('/sound-library/'):
                     print(f"Found link: {href}")
                     animal_links.append(href)
@@ -77,7 +79,7 @@ def get_animal_links(session):
         print(f"Error getting animal links: {str(e)}")
         return []
 
-def process_animal_page(session, url):
+def process_animal_page(fetcher, manifest, url):
     """Process a single animal page to extract image and sound URLs."""
     try:
         print(f"\nProcessing page: {url}")
@@ -85,9 +87,10 @@ def process_animal_page(session, url):
         # Get the animal name from the URL
         animal_name = url.split('/')[-2].replace('-', ' ').title()
         print(f"Processing: {animal_name}")
+        key = clean_filename(animal_name)
         
         # Get the page content
-        response = session.get(url)
+        response = fetcher.get(url)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
         
@@ -96,8 +99,8 @@ def process_animal_page(session, url):
         for img in soup.find_all('img', class_=['wp-post-image', 'attachment-full']):
             image_url = img.get('src')
             if image_url:
-                image_filename = f"static/images/{clean_filename(animal_name)}.jpg"
-                if download_file(session, image_url, image_filename):
+                image_url = urljoin(url, image_url)
+                if download_image(fetcher, manifest, key, animal_name, image_url):
                     image_found = True
                     break
         
@@ -106,8 +109,8 @@ def process_animal_page(session, url):
             for img in soup.find_all('img'):
                 image_url = img.get('src')
                 if image_url and ('sound-library' in image_url or 'wp-content' in image_url):
-                    image_filename = f"static/images/{clean_filename(animal_name)}.jpg"
-                    if download_file(session, image_url, image_filename):
+                    image_url = urljoin(url, image_url)
+                    if download_image(fetcher, manifest, key, animal_name, image_url):
                         image_found = True
                         break
         
@@ -124,8 +127,8 @@ def process_animal_page(session, url):
             if source:
                 sound_url = source.get('src')
                 if sound_url:
-                    sound_filename = f"static/sounds/{clean_filename(animal_name)}.mp3"
-                    if download_file(session, sound_url, sound_filename):
+                    sound_url = urljoin(url, sound_url)
+                    if download_sound(fetcher, manifest, key, animal_name, sound_url, '.mp3'):
                         sound_found = True
         
         # If no audio element, try finding direct links
@@ -134,8 +137,7 @@ def process_animal_page(session, url):
                 href = link.get('href', '')
                 if href.endswith(('.mp3', '.wav')):
                     ext = '.mp3' if href.endswith('.mp3') else '.wav'
-                    sound_filename = f"static/sounds/{clean_filename(animal_name)}{ext}"
-                    if download_file(session, href, sound_filename):
+                    if download_sound(fetcher, manifest, key, animal_name, urljoin(url, href), ext):
                         sound_found = True
                         break
         
@@ -148,20 +150,34 @@ def process_animal_page(session, url):
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='Download animal images and sounds from the OCR sound library.')
+    parser.add_argument('--base-url', default=BASE_URL, help='site to scrape (e.g. a local test server)')
+    parser.add_argument('--workers', type=int, default=8, help='animal pages processed in parallel')
+    parser.add_argument('--per-host', type=int, default=PER_HOST_LIMIT, help='concurrent requests per host')
+    parser.add_argument('--min-interval', type=float, default=MIN_INTERVAL, help='seconds between request starts per host')
+    args = parser.parse_args()
+
     # Set up directories
     setup_directories()
     
-    # Create a session with proper headers
-    session = create_session()
+    # One pooled session shared by every worker; politeness is enforced per host
+    fetcher = Fetcher(create_session(pool_size=args.per_host), per_host=args.per_host, min_interval=args.min_interval)
+    
+    # Everything fetched is recorded in the shared media manifest
+    manifest = MediaManifest()
+    if not manifest.exists:
+        adopt(manifest)
     
     # Get all animal links
-    animal_links = get_animal_links(session)
+    animal_links = get_animal_links(fetcher, args.base_url)
     print(f"\nTotal unique animal links found: {len(animal_links)}")
     
-    # Process each animal
-    for url in animal_links:
-        process_animal_page(session, url)
-        time.sleep(2)  # Be nice to the server
+    # Process the animals in parallel
+    try:
+        fetcher.map(lambda url: process_animal_page(fetcher, manifest, url), animal_links, workers=args.workers)
+    finally:
+        fetcher.save_state()
+        manifest.save()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
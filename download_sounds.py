@@ -1,265 +1,93 @@
-import os
-import requests
-from pathlib import Path
-import time
+import argparse
 import re
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import TimeoutException, WebDriverException
-from pydub import AudioSegment
-import subprocess
+from pathlib import Path
+from audio_processing import process_to_duration
+from fetcher import Fetcher
+from media_manifest import MediaManifest, adopt, fetch_source
+from page_extract import ANIMAL_PAGES, extract_links
 
 def clean_filename(name):
     """Convert animal name to a clean filename."""
     name = re.sub(r'[^\w\s-]', '', name)
     return name.replace(' ', '_').lower()
 
-def download_audio(url, filename):
-    """Download an audio file from URL and save it."""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        sounds_dir = Path('static/sounds')
-        sounds_dir.mkdir(parents=True, exist_ok=True)
-        
-        filepath = sounds_dir / filename
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
-        print(f"Downloaded: {filename}")
-        return True
-    except Exception as e:
-        print(f"Error downloading {filename}: {str(e)}")
-        return False
-
 def convert_and_process_audio(input_file, output_file, duration=5000):
     """Convert audio file to WAV format and process it to a specific duration."""
     try:
-        # Load the audio file
-        audio = AudioSegment.from_file(input_file)
-        
-        # If the audio is shorter than the target duration, loop it
-        if len(audio) < duration:
-            repeats = duration // len(audio) + 1
-            audio = audio * repeats
-        
-        # Trim to the target duration
-        audio = audio[:duration]
-        
-        # Export as WAV
-        audio.export(output_file, format='wav')
+        # Decode, loop/trim into a single buffer and write the WAV directly
+        process_to_duration(input_file, output_file, duration_ms=duration)
         print(f"Converted and processed: {output_file}")
         return True
     except Exception as e:
         print(f"Error converting {input_file}: {str(e)}")
         return False
 
-def setup_driver():
-    """Set up and return a configured Chrome WebDriver."""
-    chrome_options = Options()
-    chrome_options.add_argument('--headless=new')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--window-size=1920,1080')
-    chrome_options.add_argument('--remote-debugging-port=9222')
-    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-    
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        return driver
-    except Exception as e:
-        print(f"Error setting up Chrome WebDriver: {str(e)}")
-        return None
-
-def get_animal_sounds():
-    """Get animal sounds from OCR website using Selenium."""
-    base_url = 'https://ocr.org'
-    
-    # Known animal pages with their display names
-    animals = {
-        '/sound-library/right-whale/': 'Right Whale',
-        '/sound-library/orca/': 'Orca',
-        '/sound-library/cuviers-beaked-whale/': 'Cuvier\'s Beaked Whale',
-        '/sound-library/leopard-seal/': 'Leopard Seal',
-        '/sound-library/manatee/': 'Manatee',
-        '/sound-library/dolphin/': 'Dolphin',
-        '/sound-library/humpback-whale/': 'Humpback Whale',
-        '/sound-library/gray-whale/': 'Gray Whale',
-        '/sound-library/bowhead-whale/': 'Bowhead Whale',
-        '/sound-library/weddell-seal/': 'Weddell Seal',
-        '/sound-library/sperm-whale/': 'Sperm Whale',
-        '/sound-library/minke-whale/': 'Minke Whale',
-        '/sound-library/ringed-seal/': 'Ringed Seal',
-        '/sound-library/belugas/': 'Beluga',
-        '/sound-library/rissos-dolphin/': 'Risso\'s Dolphin',
-        '/sound-library/harbor-seal/': 'Harbor Seal',
-        '/sound-library/pilot-whale/': 'Pilot Whale',
-        '/sound-library/walrus/': 'Walrus'
-    }
-    
-    # Check which sounds we already have
+def get_animal_sounds(use_browser=True, refresh=False):
+    """Get animal sounds from the OCR website, parsing the page HTML directly."""
     sounds_dir = Path('static/sounds')
-    existing_sounds = {f.stem.replace('processed_', '') for f in sounds_dir.glob('processed_*.wav')}
+    sounds_dir.mkdir(parents=True, exist_ok=True)
     
-    # Keep track of downloaded sounds to avoid duplicates
-    downloaded_urls = set()
+    # Sources and outputs are tracked in the shared media manifest
+    manifest = MediaManifest()
+    if not manifest.exists:
+        adopt(manifest)
+    added = 0
     
-    print("Setting up Chrome WebDriver...")
-    driver = setup_driver()
-    
-    if not driver:
-        print("Failed to set up Chrome WebDriver. Exiting.")
-        return
+    pages = []
+    for path, display_name in ANIMAL_PAGES.items():
+        # Skip if we already have the sound
+        if manifest.output_path(clean_filename(display_name), 'sound'):
+            print(f"Skipping {display_name} - sound already exists")
+            continue
+        pages.append((path, display_name))
     
+    fetcher = Fetcher()
     try:
-        print("Starting to process animal pages...")
-        for path, display_name in animals.items():
-            animal_name = clean_filename(display_name)
-            
-            # Skip if we already have the sound
-            if animal_name in existing_sounds:
-                print(f"\nSkipping {display_name} - sound already exists")
+        for display_name, audio_urls in extract_links(fetcher, pages, 'audio', use_browser=use_browser, refresh=refresh):
+            if not audio_urls:
+                print(f"No audio elements found for {display_name}")
                 continue
+        
+            # Try to find audio that no other species already uses
+            animal_name = clean_filename(display_name)
+            audio_found = False
+            for audio_url in audio_urls:
+                owner = manifest.url_owner(audio_url, 'sound')
+                if owner not in (None, animal_name):
+                    continue
             
-            animal_url = urljoin(base_url, path)
-            print(f"\nProcessing {display_name}...")
+                print(f"Found audio URL: {audio_url}")
             
-            try:
-                print(f"Accessing {animal_url}")
-                driver.get(animal_url)
-                
-                # Wait for content to load with longer timeout
-                try:
-                    wait = WebDriverWait(driver, 30)  # Increased timeout to 30 seconds
-                    wait.until(EC.presence_of_element_located((By.TAG_NAME, 'article')))
-                except TimeoutException:
-                    print(f"Timeout waiting for {display_name} page to load")
+                # Download the audio file
+                temp_file = sounds_dir / f"temp_{animal_name}.mp3"
+                status = fetch_source(manifest, fetcher, animal_name, 'sound', audio_url, temp_file, name=display_name)
+                if status in ('failed', 'duplicate'):
                     continue
-                
-                # Give more time for dynamic content to load
-                time.sleep(5)  # Increased wait time to 5 seconds
-                
-                # Parse the page
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                
-                # Try different ways to find the content
-                content = None
-                for selector in [
-                    ('article', {}),
-                    ('div', {'class': 'post'}),
-                    ('div', {'class': 'entry'}),
-                    ('div', {'class': 'content-area'}),
-                    ('div', {'class': 'entry-content'})
-                ]:
-                    content = soup.find(selector[0], selector[1])
-                    if content:
-                        break
-                
-                if not content:
-                    print(f"No content found for {display_name}")
-                    continue
-                
-                # Find audio elements with more variations
-                audio_elements = []
-                
-                # Look for standard audio elements
-                audio_elements.extend(content.find_all(['audio', 'source']))
-                
-                # Look for video elements (they might contain audio)
-                video_elements = content.find_all('video')
-                for video in video_elements:
-                    sources = video.find_all('source')
-                    audio_elements.extend(sources)
-                
-                # Look for links that might be audio files
-                links = content.find_all('a', href=re.compile(r'\.(mp3|wav|m4a|ogg|mp4)$'))
-                audio_elements.extend(links)
-                
-                if not audio_elements:
-                    print(f"No audio elements found for {display_name}")
-                    
-                    # Try JavaScript rendered content
-                    try:
-                        # Execute JavaScript to get dynamically loaded content
-                        dynamic_content = driver.execute_script("return document.documentElement.outerHTML;")
-                        dynamic_soup = BeautifulSoup(dynamic_content, 'html.parser')
-                        
-                        # Look for audio URLs in the dynamic content
-                        audio_urls = re.findall(r'https?://[^\s<>"]+?\.(?:mp3|wav|m4a|ogg|mp4)[^\s<>"]*', dynamic_content)
-                        for url in audio_urls:
-                            audio_elements.append({'src': url})
-                    except Exception as e:
-                        print(f"Error getting dynamic content: {str(e)}")
-                    
-                    if not audio_elements:
-                        continue
-                
-                # Try to find a unique audio file
-                audio_found = False
-                for audio in audio_elements:
-                    # Get the audio URL from various possible attributes
-                    audio_url = None
-                    for attr in ['src', 'href', 'data-src']:
-                        audio_url = audio.get(attr)
-                        if audio_url:
-                            break
-                    
-                    if not audio_url:
-                        continue
-                    
-                    if not audio_url.startswith('http'):
-                        audio_url = urljoin(base_url, audio_url)
-                    
-                    # Skip if we've already downloaded this URL
-                    if audio_url in downloaded_urls:
-                        continue
-                    
-                    print(f"Found audio URL: {audio_url}")
-                    
-                    # Download the audio file
-                    temp_file = sounds_dir / f"temp_{animal_name}.mp3"
-                    if download_audio(audio_url, temp_file.name):
-                        # Convert and process to WAV
-                        output_file = sounds_dir / f"processed_{animal_name}.wav"
-                        if convert_and_process_audio(temp_file, output_file):
-                            downloaded_urls.add(audio_url)
-                            audio_found = True
-                            # Clean up temp file
-                            temp_file.unlink()
-                            break
-                
-                if not audio_found:
-                    print(f"No unique audio found for {display_name}")
-                
-                time.sleep(2)  # Be nice to the server
-                
-            except WebDriverException as e:
-                print(f"WebDriver error processing {display_name}: {str(e)}")
-                continue
-            except Exception as e:
-                print(f"Error processing {display_name}: {str(e)}")
-                continue
-    
-    except Exception as e:
-        print(f"Error: {str(e)}")
+            
+                # Convert and process to WAV
+                output_file = sounds_dir / f"processed_{animal_name}.wav"
+                if convert_and_process_audio(temp_file, output_file):
+                    manifest.record_output(animal_name, 'sound', output_file)
+                    added += 1
+                    audio_found = True
+                # Clean up temp file; its URL and hash stay in the manifest
+                temp_file.unlink(missing_ok=True)
+                manifest.forget_source_file(animal_name, 'sound')
+                if audio_found:
+                    break
+        
+            if not audio_found:
+                print(f"No unique audio found for {display_name}")
+            manifest.save()
     
     finally:
-        print("Closing browser...")
-        driver.quit()
-    
-    print(f"\nSound download complete! Downloaded {len(downloaded_urls)} unique sounds.")
+        fetcher.save_state()
+        manifest.save()
+    print(f"\nSound download complete! Downloaded {added} unique sounds.")
 
 if __name__ == '__main__':
-    get_animal_sounds() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Download and process animal sounds from the OCR sound library.')
+    parser.add_argument('--no-browser', action='store_true', help="never fall back to headless Chrome")
+    parser.add_argument('--refresh', action='store_true', help='ignore cached pages')
+    args = parser.parse_args()
+    get_animal_sounds(use_browser=not args.no_browser, refresh=args.refresh)
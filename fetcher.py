@@ -0,0 +1,205 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from atomic_files import write_json
+
+# Validators and partial-download info for every file fetched, keyed by destination path
+STATE_PATH = Path('cache/download_state.json')
+
+# Politeness defaults: parallel requests per host and minimum gap between their starts
+PER_HOST_LIMIT = 4
+MIN_INTERVAL = 0.5
+
+CHUNK_SIZE = 64 * 1024
+
+class HostLimiter:
+    """Bound the number of concurrent requests to a host and the rate they start at."""
+
+    def __init__(self, per_host=PER_HOST_LIMIT, min_interval=MIN_INTERVAL):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    def acquire(self, host):
+        self._semaphore(host).acquire()
+        # Reserve the next start slot for this host, then wait for it outside the lock
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host):
+        self._semaphore(host).release()
+
+class Fetcher:
+    """Shared, pooled HTTP client for scraping pages and downloading media in parallel.
+
+    Downloads send If-None-Match/If-Modified-Since for files fetched before, so
+    unchanged media costs a 304, and interrupted downloads resume with a Range request.
+    """
+
+    def __init__(self, session=None, per_host=PER_HOST_LIMIT, min_interval=MIN_INTERVAL,
+                 state_path=STATE_PATH, timeout=30):
+        self.session = session or create_session(pool_size=per_host)
+        self.limiter = HostLimiter(per_host, min_interval)
+        self.timeout = timeout
+        self.state_path = Path(state_path)
+        self._state_lock = threading.Lock()
+        self._state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        with self._state_lock:
+            write_json(self.state_path, self._state, indent=2, sort_keys=True)
+
+    def _set_state(self, key, entry):
+        with self._state_lock:
+            if entry is None:
+                self._state.pop(key, None)
+            else:
+                self._state[key] = entry
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the per-host limiter."""
+        host = urlsplit(url).netloc
+        kwargs.setdefault('timeout', self.timeout)
+        self.limiter.acquire(host)
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            self.limiter.release(host)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def part_path(self, filename):
+        """Where a download of filename is written until it is complete."""
+        filename = Path(filename)
+        return filename.with_name(f'{filename.name}.part')
+
+    def download(self, url, filename, commit=True):
+        """Download url to filename. Returns 'downloaded', 'not_modified' or 'failed'.
+
+        With commit=False a finished download is left in part_path(filename) for the
+        caller to check and then commit() or discard(); the file already at filename
+        only supplies the conditional request.
+        """
+        filename = Path(filename)
+        part_file = self.part_path(filename)
+        # Validators of the file we have, and of the bytes in the part file
+        entry = self._state.get(str(filename)) or {}
+        if entry.get('url') != url or entry.get('partial'):
+            # Older state kept a part file's validators under the final name
+            entry = {}
+        part_entry = self._state.get(str(part_file)) or {}
+        if part_entry.get('url') != url:
+            part_entry = {}
+
+        # Ranges and validators refer to the stored bytes, so ask for them unencoded
+        headers = {'Accept-Encoding': 'identity'}
+        offset = 0
+        if part_file.exists() and part_entry:
+            # Resume only if the server still has the same version (If-Range)
+            offset = part_file.stat().st_size
+            headers['Range'] = f'bytes={offset}-'
+            validator = part_entry.get('etag') or part_entry.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+        elif filename.exists():
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            host = urlsplit(url).netloc
+            self.limiter.acquire(host)
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304:
+                        print(f"Not modified: {filename}")
+                        return 'not_modified'
+                    if response.status_code == 416 and offset:
+                        # Nothing left to fetch; the partial file is the whole thing
+                        response.close()
+                    else:
+                        response.raise_for_status()
+                        mode = 'ab' if offset and response.status_code == 206 else 'wb'
+                        self._set_state(str(part_file), {
+                            'url': url,
+                            'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified')
+                        })
+                        # Saved now, so a run that is killed mid-download can still resume it
+                        self.save_state()
+                        filename.parent.mkdir(parents=True, exist_ok=True)
+                        with open(part_file, mode) as f:
+                            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                                if chunk:
+                                    f.write(chunk)
+            finally:
+                self.limiter.release(host)
+
+            if commit:
+                self.commit(filename)
+            print(f"Successfully downloaded: {filename}")
+            return 'downloaded'
+        except Exception as e:
+            print(f"Error downloading {filename}: {str(e)}")
+            return 'failed'
+
+    def commit(self, filename):
+        """Move a finished download into place at filename, along with its validators."""
+        part_file = self.part_path(filename)
+        part_file.replace(filename)
+        with self._state_lock:
+            entry = self._state.pop(str(part_file), None)
+            if entry is None:
+                self._state.pop(str(filename), None)
+            else:
+                self._state[str(filename)] = entry
+
+    def discard(self, filename):
+        """Delete a finished download that won't be used; filename is left as it was."""
+        part_file = self.part_path(filename)
+        part_file.unlink(missing_ok=True)
+        self._set_state(str(part_file), None)
+
+    def map(self, fn, items, workers=8):
+        """Run fn(item) for every item on a thread pool, returning the results in order."""
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fn, items))
+
+def create_session(pool_size=PER_HOST_LIMIT, headers=None, retries=3):
+    """Create a requests session whose connection pool matches the per-host limit."""
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=['GET', 'HEAD'], respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
@@ -1,9 +1,52 @@
-bind = "0.0.0.0:10000"
-workers = 2
-threads = 4
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
 timeout = 120
 max_requests = 1000
 max_requests_jitter = 50
-worker_class = 'sync'
-worker_connections = 1000
-keepalive = 5 
\ No newline at end of file
+keepalive = 5
+
+# 'sync' (default) serves threads * workers requests at once. 'gevent' serves each
+# connection from a greenlet, so slow uploads, sound downloads and SSE streams only
+# hold a socket; install requirements-async.txt to use it.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class == 'gevent':
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '2000'))
+else:
+    threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+    worker_connections = 1000
+
+# GUNICORN_PRELOAD=1 imports the app once in the master, so workers fork with it loaded
+# and starting or recycling one takes milliseconds
+preload_app = os.environ.get('GUNICORN_PRELOAD', '') == '1'
+
+# Every worker writes its metrics here, so /metrics reports the totals of all of them
+os.environ.setdefault('METRICS_DIR', os.path.join('cache', 'metrics'))
+
+def on_starting(server):
+    # Counts left by a previous run would be added to this one's
+    import metrics
+    metrics.clear_shared_metrics()
+
+def child_exit(server, worker):
+    # A dead worker's counts still count; its queue depth doesn't
+    import metrics
+    metrics.mark_process_dead(worker.pid)
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded and before any worker is forked.
+    # Inline analysis runs in the web workers, so they inherit the warm DSP stack; pooled
+    # analysis processes fork from each worker's own forkserver and gain nothing from it
+    import analysis_pool
+    if preload_app and analysis_pool.ANALYSIS_WORKERS <= 0:
+        analysis_pool.warm_up()
+
+def post_worker_init(worker):
+    import analysis_pool
+    if worker_class == 'gevent' and analysis_pool.ANALYSIS_WORKERS <= 0:
+        # Inline analysis would run on the event loop and stall every connection
+        worker.log.warning("ANALYSIS_WORKERS=0 with gevent workers blocks all requests during analysis")
+    # Spawn the analysis processes in the background; analyses queue until they are warm,
+    # and every other route is served straight away
+    analysis_pool.start(wait=False)
@@ -0,0 +1,95 @@
+import hashlib
+import io
+import json
+import sys
+from pathlib import Path
+from atomic_files import write_atomic, write_json
+from static_assets import asset_url
+
+IMAGES_DIR = Path('static/images')
+DERIVATIVES_DIR = IMAGES_DIR / 'derivatives'
+MANIFEST_PATH = DERIVATIVES_DIR / 'manifest.json'
+
+# Widths generated for every image (never wider than the original)
+WIDTHS = [160, 320, 640]
+
+# Output formats in order of preference: extension -> (mimetype, Pillow format, save options)
+FORMATS = {
+    'avif': ('image/avif', 'AVIF', {'quality': 50}),
+    'webp': ('image/webp', 'WEBP', {'quality': 75, 'method': 6}),
+}
+
+# Matches the .animal-image CSS: full width on small screens, at most 300px
+IMAGE_SIZES = '(max-width: 360px) 90vw, 300px'
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(manifest, path=MANIFEST_PATH):
+    write_json(path, manifest, indent=2, sort_keys=True)
+
+def _supported_formats():
+    from PIL import features
+    return [ext for ext, (_, pil_format, _) in FORMATS.items() if features.check(pil_format.lower())]
+
+def build_derivatives(image_path, formats):
+    """Write every width/format derivative of one image and return its manifest entry."""
+    from PIL import Image, ImageOps
+
+    with Image.open(image_path) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        widths = sorted({min(width, image.width) for width in WIDTHS})
+        variants = {ext: [] for ext in formats}
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            for ext in formats:
+                _, pil_format, options = FORMATS[ext]
+                filename = f'{image_path.stem}-{width}.{ext}'
+                buffer = io.BytesIO()
+                resized.save(buffer, format=pil_format, **options)
+                write_atomic(DERIVATIVES_DIR / filename, buffer.getvalue())
+                variants[ext].append({'width': width, 'file': filename})
+        return {'width': image.width, 'height': image.height, 'variants': variants}
+
+def build_all(force=False):
+    """Generate derivatives for every JPEG that changed since the last run."""
+    DERIVATIVES_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    formats = _supported_formats()
+    for image_path in sorted(IMAGES_DIR.glob('*.jpg')):
+        source_hash = hashlib.sha256(image_path.read_bytes()).hexdigest()
+        entry = manifest.get(image_path.stem)
+        if not force and entry and entry.get('sha256') == source_hash and list(entry['variants']) == formats:
+            continue
+        try:
+            entry = build_derivatives(image_path, formats)
+            entry['sha256'] = source_hash
+            manifest[image_path.stem] = entry
+            print(f"Built derivatives for {image_path.name}")
+        except Exception as e:
+            print(f"Error building derivatives for {image_path.name}: {str(e)}")
+    _save_manifest(manifest)
+    return manifest
+
+def image_sources(stem, manifest, url_prefix='/static/images/derivatives'):
+    """Return <picture> source data ({type, srcset}) for an image, best format first."""
+    entry = manifest.get(stem)
+    if not entry:
+        return []
+    sources = []
+    for ext, variants in entry['variants'].items():
+        srcset = ', '.join(
+            f"{asset_url(url_prefix, str(DERIVATIVES_DIR), variant['file'])} {variant['width']}w"
+            for variant in variants
+        )
+        sources.append({'type': FORMATS[ext][0], 'srcset': srcset})
+    return sources
+
+if __name__ == '__main__':
+    manifest = build_all(force='--force' in sys.argv[1:])
+    print(f"{len(manifest)} images in {MANIFEST_PATH}")
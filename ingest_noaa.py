@@ -0,0 +1,121 @@
+import argparse
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+from atomic_files import write_json
+from audio_processing import process_to_duration
+from catalog import EXTRA_ANIMALS_PATH, clean_filename, load_extra_animals
+from fetcher import Fetcher
+from media_manifest import MediaManifest, adopt, fetch_source
+from renditions import encode_renditions
+
+NOAA_CATALOG = 'noaa_sound_analysis.json'
+SOUNDS_DIR = Path('static/sounds')
+
+# How each group in the NOAA catalog is described to players
+GROUPS = {
+    'mysticetes': 'a baleen whale',
+    'odontocetes': 'a toothed whale',
+    'pinnipeds': 'a pinniped, the family of seals, sea lions and walruses'
+}
+
+# NOAA names for species the library already has under another name
+ALIASES = {
+    'Killer Whale': 'Orca',
+    'Beluga Whale': 'Beluga',
+    'Beaked Whale': 'Cuvier\'s Beaked Whale'
+}
+
+def load_species(path=NOAA_CATALOG):
+    """Return every species in the NOAA catalog as a flat list, tagged with its group."""
+    with open(path) as f:
+        catalog = json.load(f)
+    species = []
+    for group, entries in catalog.items():
+        for entry in entries:
+            species.append(dict(entry, group=group))
+    return species
+
+def describe(species):
+    group = GROUPS.get(species['group'], 'a marine mammal')
+    return (f"The {species['common_name']} ({species['scientific_name']}) is {group}. "
+            f"This recording comes from NOAA Fisheries' passive acoustic monitoring.")
+
+def ingest_species(fetcher, manifest, species, duration=5000, normalize_dbfs=-20.0, force=False):
+    """Download, normalize and store one species' clip. Returns a status string."""
+    name = ALIASES.get(species['common_name'], species['common_name'])
+    key = clean_filename(name)
+    output_file = SOUNDS_DIR / f"processed_{key}.wav"
+    if not species.get('audio_urls'):
+        return 'no_audio'
+    # Hand-picked sounds already in the library are never replaced
+    if output_file.exists() and not force:
+        return 'exists'
+
+    for url in species['audio_urls']:
+        owner = manifest.url_owner(url, 'sound')
+        if owner not in (None, key):
+            continue
+        temp_file = SOUNDS_DIR / f"temp_{key}{Path(urlsplit(url).path).suffix or '.mp3'}"
+        status = fetch_source(manifest, fetcher, key, 'sound', url, temp_file, name=name)
+        if status in ('failed', 'duplicate'):
+            continue
+        try:
+            # One clip per worker at a time; the download was streamed to disk
+            process_to_duration(temp_file, output_file, duration_ms=duration, normalize_dbfs=normalize_dbfs)
+            encode_renditions(output_file, force=True)
+            manifest.record_output(key, 'sound', output_file)
+            print(f"Ingested: {name}")
+            return 'ingested'
+        except Exception as e:
+            print(f"Error processing {name}: {str(e)}")
+        finally:
+            temp_file.unlink(missing_ok=True)
+            manifest.forget_source_file(key, 'sound')
+    return 'failed'
+
+def main():
+    parser = argparse.ArgumentParser(description='Add the species in the NOAA sound catalog to the game.')
+    parser.add_argument('--catalog', default=NOAA_CATALOG, help='NOAA catalog JSON')
+    parser.add_argument('--workers', type=int, default=4, help='clips downloaded and processed in parallel')
+    parser.add_argument('--duration', type=int, default=5000, help='clip length in milliseconds')
+    parser.add_argument('--normalize', type=float, default=-20.0, metavar='DBFS', help='loudness to normalize clips to')
+    parser.add_argument('--force', action='store_true', help='replace sounds that already exist')
+    args = parser.parse_args()
+
+    SOUNDS_DIR.mkdir(parents=True, exist_ok=True)
+    species = load_species(args.catalog)
+    manifest = MediaManifest()
+    if not manifest.exists:
+        adopt(manifest)
+    fetcher = Fetcher()
+
+    try:
+        results = fetcher.map(
+            lambda entry: ingest_species(fetcher, manifest, entry, args.duration, args.normalize, args.force),
+            species, workers=args.workers
+        )
+    finally:
+        fetcher.save_state()
+        manifest.save()
+
+    # Ingested species join the runtime catalog; the apps reload when this file changes
+    extra_animals = load_extra_animals()
+    for entry, status in zip(species, results):
+        if status == 'ingested':
+            extra_animals[ALIASES.get(entry['common_name'], entry['common_name'])] = {
+                'category': 'Mammal',
+                'description': describe(entry),
+                'scientific_name': entry['scientific_name'],
+                'group': entry['group'],
+                'source': 'NOAA Fisheries'
+            }
+    write_json(EXTRA_ANIMALS_PATH, extra_animals, indent=2, sort_keys=True)
+
+    counts = {}
+    for status in results:
+        counts[status] = counts.get(status, 0) + 1
+    print("\nNOAA ingest complete! " + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,23 @@
-from flask import Flask, render_template, send_from_directory, jsonify, request, session
+from flask import Flask, render_template, jsonify, request, session
 from pathlib import Path
-import random
-import librosa
-import numpy as np
-import soundfile as sf
-import io
-import wave
 import os
+import analysis_pool
+import metrics
+from analysis_jobs import job_accepted, jobs_bp, submit_job
+from analysis_pool import PoolBusy, RETRY_AFTER, run_analysis
+from catalog import EXTRA_ANIMALS_PATH, AnimalCatalog, clean_filename, list_files, load_extra_animals
+from image_derivatives import IMAGE_SIZES, image_sources, load_manifest as load_image_manifest
+from renditions import RENDITIONS_DIRNAME, available_formats, choose_rendition
+from static_assets import asset_url, load_build_manifest, send_asset, send_prebuilt
+from uploads import MAX_UPLOAD_BYTES, archive_async, unique_filename
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Required for session support
+app.register_blueprint(jobs_bp)
+metrics.init_app(app)
+
+# Set ARCHIVE_RECORDINGS=1 to keep a copy of every analyzed recording in static/recordings
+ARCHIVE_RECORDINGS = os.environ.get('ARCHIVE_RECORDINGS', '') == '1'
 
 # Cute descriptions for each animal
 ANIMAL_DESCRIPTIONS = {
@@ -37,117 +45,132 @@ ANIMAL_DESCRIPTIONS = {
     'Snapping Shrimp': 'Snapping shrimp make popping sounds like underwater bubbles! 🦐'
 }
 
+# Reference sounds, in lookup order: the processed library, then sounds written by
+# ingest scripts (e.g. ingest_noaa.py) for the species in catalog_extra.json
+REFERENCE_SOUND_DIRS = [Path('static/sounds/processed'), Path('static/sounds')]
+
+# Reference features are loaded by the analysis processes (or on first use when analyzing
+# inline), so the web worker never imports the DSP stack
+analysis_pool.configure([str(sounds_dir) for sounds_dir in REFERENCE_SOUND_DIRS])
+
+def find_reference_sound(key):
+    """Return the path of processed_<key>.wav, or None if there isn't one."""
+    for sounds_dir in REFERENCE_SOUND_DIRS:
+        path = sounds_dir / f'processed_{key}.wav'
+        if path.exists():
+            return str(path)
+    return None
+
 def get_available_animals():
-    """Get list of available animals from the processed sounds directory."""
-    sounds_dir = Path('static/sounds/processed')
-    if not sounds_dir.exists():
-        return []
-    
+    """Get list of available animals from the processed sounds directory and ingested species."""
+    sounds_dir, ingested_dir = REFERENCE_SOUND_DIRS
+    derivatives = load_image_manifest()
+    extra_animals = load_extra_animals()
+
+    # Convert filename to animal name (e.g., 'processed_humpback_whale.wav' -> 'humpback whale')
+    sounds = {}
+    if sounds_dir.exists():
+        for sound_file in sorted(sounds_dir.glob('processed_*.wav')):
+            key = sound_file.stem.replace('processed_', '')
+            sounds[key] = (key.replace('_', ' ').title(), sound_file, '/sounds/processed')
+    # Ingested species live next to the raw downloads and are named by catalog_extra.json
+    for animal_name in sorted(extra_animals):
+        key = clean_filename(animal_name)
+        sound_file = ingested_dir / f'processed_{key}.wav'
+        if key not in sounds and sound_file.exists():
+            sounds[key] = (animal_name, sound_file, '/sounds')
+
+    rendition_files = {}
     animals = []
-    for sound_file in sounds_dir.glob('processed_*.wav'):
-        # Convert filename to animal name (e.g., 'processed_humpback_whale.wav' -> 'humpback whale')
-        animal_name = sound_file.stem.replace('processed_', '').replace('_', ' ').title()
+    for key, (animal_name, sound_file, url_prefix) in sounds.items():
+        if sound_file.parent not in rendition_files:
+            rendition_files[sound_file.parent] = list_files(sound_file.parent / RENDITIONS_DIRNAME, '')
+        has_image = os.path.exists(os.path.join('static/images', f'{key}.jpg'))
         animals.append({
             'name': animal_name,
-            'sound': f'/sounds/processed/{sound_file.name}',
-            'image': f'/images/{sound_file.stem.replace("processed_", "")}.jpg',
-            'description': ANIMAL_DESCRIPTIONS.get(animal_name, 'Listen to this amazing marine animal! 🌊')
+            'key': key,
+            'sound': asset_url(url_prefix, sound_file.parent, sound_file.name),
+            'sound_formats': available_formats(sound_file.stem, rendition_files[sound_file.parent]),
+            'image': asset_url('/images', 'static/images', f'{key}.jpg') if has_image else None,
+            'image_sources': image_sources(key, derivatives, url_prefix='/images/derivatives'),
+            'image_sizes': IMAGE_SIZES,
+            'description': ANIMAL_DESCRIPTIONS.get(animal_name)
+                or extra_animals.get(animal_name, {}).get('description', 'Listen to this amazing marine animal! 🌊')
         })
     return animals
 
-def analyze_audio(original_path, user_path):
+# Catalog of available animals, built once and refreshed when the sounds directories change
+catalog = AnimalCatalog(get_available_animals, watch_dirs=[
+    'static/sounds/processed', 'static/sounds/processed/renditions', 'static/sounds',
+    'static/sounds/renditions', 'static/images/derivatives', EXTRA_ANIMALS_PATH
+])
+CATALOG_POLL_INTERVAL = int(os.environ.get('CATALOG_POLL_INTERVAL', '30'))
+if CATALOG_POLL_INTERVAL > 0:
+    catalog.start_watcher(CATALOG_POLL_INTERVAL)
+
+def analyze_audio(original_path, user_audio):
+    from scoring import score_audio
     try:
-        # Load audio files
-        original, sr_orig = librosa.load(original_path, sr=None)
-        user, sr_user = librosa.load(user_path, sr=None)
-        
-        # Resample user audio to match original sample rate if needed
-        if sr_user != sr_orig:
-            user = librosa.resample(user, orig_sr=sr_user, target_sr=sr_orig)
-        
-        # Ensure both audio files are the same length
-        min_len = min(len(original), len(user))
-        original = original[:min_len]
-        user = user[:min_len]
-        
-        # Extract pitch features
-        original_pitch, original_mag = librosa.piptrack(y=original, sr=sr_orig)
-        user_pitch, user_mag = librosa.piptrack(y=user, sr=sr_orig)
-        
-        # Get mean pitch values (ignoring zero magnitudes)
-        original_pitch_mean = np.mean(original_pitch[original_mag > 0])
-        user_pitch_mean = np.mean(user_pitch[user_mag > 0])
-        
-        # Calculate pitch similarity (much stricter scaling)
-        pitch_diff = abs(original_pitch_mean - user_pitch_mean)
-        pitch_score = max(0, 100 - (pitch_diff / 10))  # Much stricter scaling factor
-        
-        # Extract basic features for rhythm
-        original_onset = librosa.onset.onset_strength(y=original, sr=sr_orig)
-        user_onset = librosa.onset.onset_strength(y=user, sr=sr_orig)
-        
-        # Calculate rhythm similarity (much stricter scaling)
-        rhythm_diff = np.mean(np.abs(original_onset - user_onset))
-        rhythm_score = max(0, 100 - (rhythm_diff * 20))  # Much stricter scaling factor
-        
-        # Calculate energy similarity
-        original_energy = librosa.feature.rms(y=original)
-        user_energy = librosa.feature.rms(y=user)
-        energy_diff = np.mean(np.abs(original_energy - user_energy))
-        energy_score = max(0, 100 - (energy_diff * 30))  # Strict energy comparison
-        
-        # Calculate final score (weighted combination)
-        final_score = (pitch_score * 0.5 + rhythm_score * 0.3 + energy_score * 0.2)
-        
-        # Make scoring even stricter by applying a penalty for any significant differences
-        if pitch_diff > 20 or rhythm_diff > 0.5 or energy_diff > 0.3:
-            final_score *= 1  # 20% penalty for significant differences
-        
-        # Generate feedback based on score
-        if final_score >= 90:
-            feedback = "Perfect! You're a marine animal sound expert! 🌟"
-        elif final_score >= 75:
-            feedback = "Very good! You're getting really close! 🎯"
-        elif final_score >= 50:
-            feedback = "Not bad! Keep practicing to match the sound better! 🎵"
-        else:
-            feedback = "Keep trying! Focus on matching the pitch and rhythm! 💪"
-        
-        return {
-            'score': round(final_score, 1),
-            'feedback': feedback
-        }
+        # Run the DSP off the request thread on the shared analysis pool
+        return metrics.record_analysis(run_analysis(score_audio, user_audio, original_path))
+    except PoolBusy:
+        raise
     except Exception as e:
         print(f"Error in analyze_audio: {str(e)}")
+        metrics.record_analysis_error(e)
         return {
             'score': 0,
             'feedback': "Let's try again! Make sure to record a clear sound impression. 🎤"
         }
 
+# Pages prebuilt by build_static.py; templates are only rendered per request in debug
+BUILD_MANIFEST = load_build_manifest()
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    if app.debug or 'index.html' not in BUILD_MANIFEST:
+        return render_template('index.html')
+    return send_prebuilt('build', 'index.html', BUILD_MANIFEST['index.html'])
 
 @app.route('/sounds/<path:filename>')
 def serve_sound(filename):
-    return send_from_directory('static/sounds', filename)
+    # Serve a compressed rendition when the client asks for one it can play
+    path, mimetype = choose_rendition(
+        'static/sounds', filename,
+        requested_format=request.args.get('format'),
+        accept_mimetypes=request.accept_mimetypes
+    )
+    response = send_asset('static/sounds', path, mimetype=mimetype, versioned_name=filename)
+    response.vary.add('Accept')
+    return response
 
 @app.route('/images/<path:filename>')
 def serve_image(filename):
-    return send_from_directory('static/images', filename)
+    return send_asset('static/images', filename)
 
 @app.route('/api/random-animal')
 def random_animal():
-    animals = get_available_animals()
-    if not animals:
+    picked = catalog.random_entry()
+    if picked is None:
         return jsonify({'error': 'No animals available'}), 404
-    animal = random.choice(animals)
+    animal, payload = picked
     session['current_animal'] = animal  # Store the current animal in session
-    return jsonify(animal)
+    return app.response_class(payload, mimetype='application/json')
+
+@app.route('/api/catalog/reload', methods=['POST'])
+def reload_catalog():
+    try:
+        count = catalog.reload()
+        return jsonify({'success': True, 'animals': count})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/analyze_recording', methods=['POST'])
 def analyze_recording():
     try:
+        # Same limit as saved recordings; checked up front when the client declares a length
+        if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+            return jsonify({'error': 'Recording is too large'}), 413
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
         
@@ -160,27 +183,42 @@ def analyze_recording():
         if not current_animal:
             return jsonify({'error': 'No animal selected'}), 400
         
-        # Create recordings directory if it doesn't exist
-        recordings_dir = os.path.join('static', 'recordings')
-        os.makedirs(recordings_dir, exist_ok=True)
+        # Keep the upload in memory, never more than the limit; analysis decodes it straight from the bytes
+        audio_data = audio_file.read(MAX_UPLOAD_BYTES + 1)
+        if len(audio_data) > MAX_UPLOAD_BYTES:
+            return jsonify({'error': 'Recording is too large'}), 413
+        metrics.observe_upload(len(audio_data), '/api/analyze_recording')
+        animal_slug = current_animal.get('key') or current_animal["name"].lower().replace(" ", "_")
         
-        # Save the user's recording
-        user_recording_path = os.path.join(recordings_dir, f'user_{current_animal["name"].lower().replace(" ", "_")}.wav')
-        audio_file.save(user_recording_path)
+        # Optionally keep a copy of the recording, written off the request path
+        if ARCHIVE_RECORDINGS:
+            archive_async(audio_data, os.path.join('static', 'recordings'), unique_filename(f'user_{animal_slug}', '.wav'))
         
         # Get the original sound path
-        original_sound_path = os.path.join('static', 'sounds', 'processed', f'processed_{current_animal["name"].lower().replace(" ", "_")}.wav')
+        original_sound_path = find_reference_sound(animal_slug)
         
-        if not os.path.exists(original_sound_path):
+        if original_sound_path is None:
             return jsonify({
                 'score': 0,
                 'feedback': "Oops! Couldn't find the original sound. Please try another animal! 🐋"
             })
         
+        # In async mode return a job id straight away and let the client poll for the result
+        if request.form.get('mode') == 'async':
+            from scoring import score_audio
+            return job_accepted(submit_job(score_audio, audio_data, original_sound_path))
+        
         # Analyze the recording
-        result = analyze_audio(original_sound_path, user_recording_path)
+        result = analyze_audio(original_sound_path, audio_data)
         
         return jsonify(result)
+    except PoolBusy:
+        response = jsonify({
+            'score': 0,
+            'feedback': "Lots of sea creatures are being scored right now. Try again in a moment! 🐢"
+        })
+        response.headers['Retry-After'] = str(RETRY_AFTER)
+        return response, 503
     except Exception as e:
         print(f"Error processing recording: {str(e)}")
         return jsonify({
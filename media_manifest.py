@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from atomic_files import write_json
+
+# Where every ingested species' media came from and what was built from it:
+# {"species": {key: {"name", "sources": {kind: {url, sha256, path, fetched_at}},
+#                    "outputs": {kind: {path, sha256, updated_at}}}}}
+MANIFEST_PATH = Path('media_manifest.json')
+
+SOUNDS_DIR = Path('static/sounds')
+IMAGES_DIR = Path('static/images')
+
+def file_sha256(path):
+    """Return the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+class MediaManifest:
+    """Persistent record of ingested media, shared by the download and cleanup scripts.
+
+    Sources are deduplicated by content hash: a download whose bytes already
+    belong to another species is reported as a duplicate instead of being stored
+    again, and one whose bytes match what a species already has needs no rebuild.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.exists = self.path.exists()
+        self.data = {'species': {}}
+        if self.exists:
+            with open(self.path) as f:
+                self.data = json.load(f)
+
+    def save(self):
+        with self._lock:
+            write_json(self.path, self.data, indent=2, sort_keys=True)
+            self.exists = True
+
+    def species(self, key, name=None):
+        """Return the entry for a species, creating it if needed."""
+        with self._lock:
+            entry = self.data['species'].setdefault(key, {'name': name or key, 'sources': {}, 'outputs': {}})
+            if name:
+                entry['name'] = name
+            return entry
+
+    def owner(self, sha256, kind):
+        """Return the species whose source or output of this kind has the given hash."""
+        with self._lock:
+            for key, entry in self.data['species'].items():
+                for section in ('sources', 'outputs'):
+                    item = entry[section].get(kind)
+                    if item and item.get('sha256') == sha256:
+                        return key
+        return None
+
+    def record_source(self, key, kind, url, path, name=None, downloaded=None):
+        """Hash a freshly downloaded file and record it as the species' source.
+
+        downloaded is the file holding the new bytes if they are still waiting to
+        be moved to path. Returns (sha256, status) where status is 'new',
+        'unchanged' (same bytes as the species already had) or 'duplicate' (the
+        bytes belong to another species; nothing is recorded and the caller should
+        discard the download).
+        """
+        sha256 = file_sha256(downloaded or path)
+        with self._lock:
+            owner = self.owner(sha256, kind)
+            if owner is not None and owner != key:
+                return sha256, 'duplicate'
+            entry = self.species(key, name)
+            previous = entry['sources'].get(kind)
+            status = 'unchanged' if previous and previous.get('sha256') == sha256 else 'new'
+            entry['sources'][kind] = {'url': url, 'sha256': sha256, 'path': str(path), 'fetched_at': _now()}
+            return sha256, status
+
+    def forget_source_file(self, key, kind):
+        """Note that a source file was deleted after processing; its URL and hash are kept."""
+        with self._lock:
+            source = self.data['species'].get(key, {}).get('sources', {}).get(kind)
+            if source:
+                source['path'] = None
+
+    def record_output(self, key, kind, path, name=None):
+        with self._lock:
+            self.species(key, name)['outputs'][kind] = {
+                'path': str(path), 'sha256': file_sha256(path), 'updated_at': _now()
+            }
+
+    def output_path(self, key, kind):
+        """Return the output file for a species if it is recorded and still on disk."""
+        output = self.data['species'].get(key, {}).get('outputs', {}).get(kind)
+        if output and os.path.exists(output['path']):
+            return Path(output['path'])
+        return None
+
+    def url_owner(self, url, kind):
+        """Return the species whose source of this kind was downloaded from url."""
+        with self._lock:
+            for key, entry in self.data['species'].items():
+                source = entry['sources'].get(kind)
+                if source and source.get('url') == url:
+                    return key
+        return None
+
+    def source_url(self, key, kind):
+        source = self.data['species'].get(key, {}).get('sources', {}).get(kind)
+        return source.get('url') if source else None
+
+    def referenced_paths(self):
+        """Every file the manifest accounts for: outputs and sources still kept on disk."""
+        paths = set()
+        for entry in self.data['species'].values():
+            for section in ('sources', 'outputs'):
+                for item in entry[section].values():
+                    if item.get('path'):
+                        paths.add(os.path.normpath(item['path']))
+        return paths
+
+def fetch_source(manifest, fetcher, key, kind, url, path, name=None):
+    """Download url to path and record it as a species' source.
+
+    Returns the status from record_source, or 'failed'. The download only
+    replaces path once it is known not to be another species' media, so a
+    duplicate never costs a species the file it already had.
+    """
+    result = fetcher.download(url, path, commit=False)
+    if result == 'failed':
+        return 'failed'
+    # Not modified leaves the current file in place; otherwise check the new bytes first
+    downloaded = fetcher.part_path(path) if result == 'downloaded' else None
+    _, status = manifest.record_source(key, kind, url, path, name, downloaded=downloaded)
+    if downloaded is not None:
+        if status == 'duplicate':
+            fetcher.discard(path)
+        else:
+            fetcher.commit(path)
+    if status == 'duplicate':
+        print(f"Skipping {url}: same content as another species' {kind}")
+    return status
+
+def adopt(manifest, sounds_dir=SOUNDS_DIR, images_dir=IMAGES_DIR):
+    """Record media already on disk (processed_<key>.wav, <key>.jpg) as outputs."""
+    def default_name(key):
+        return None if key in manifest.data['species'] else key.replace('_', ' ').title()
+
+    for sound_file in sorted(Path(sounds_dir).glob('processed_*.wav')):
+        key = sound_file.stem[len('processed_'):]
+        manifest.record_output(key, 'sound', sound_file, name=default_name(key))
+    for image_file in sorted(Path(images_dir).glob('*.jpg')):
+        manifest.record_output(image_file.stem, 'image', image_file, name=default_name(image_file.stem))
+    return manifest
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['adopt']:
+        print(f"Usage: python {sys.argv[0]} adopt")
+        sys.exit(2)
+    manifest = adopt(MediaManifest())
+    manifest.save()
+    print(f"{len(manifest.data['species'])} species recorded in {manifest.path}")
@@ -0,0 +1,276 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from flask import Response, g, request
+from atomic_files import write_json
+
+# Set METRICS_ENABLED=0 to turn every recording call into a no-op and drop /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Histogram buckets: seconds for latencies, bytes for upload sizes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+
+# Each gunicorn worker counts in its own memory. With METRICS_DIR set, every process also
+# writes its counts to a file there and /metrics adds up the files of all workers
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
+# Seconds between a process writing its counts to METRICS_DIR
+FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+
+_lock = threading.Lock()
+_metrics = []
+
+# Flusher state: the process it runs in, that process's file and what was last written to it
+_flush_lock = threading.Lock()
+_flush_pid = None
+_flush_path = None
+_last_flushed = None
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                     for name, value in labels)
+    return '{' + pairs + '}'
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        _ensure_flusher()
+
+    def values(self):
+        return dict(self._values)
+
+    def merge(self, total, values):
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, values):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_label_text(key)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the running sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+        _ensure_flusher()
+
+    def values(self):
+        return {key: list(counts) for key, counts in self._values.items()}
+
+    def merge(self, total, values):
+        for key, counts in values.items():
+            if key in total:
+                total[key] = [a + b for a, b in zip(total[key], counts)]
+            else:
+                total[key] = list(counts)
+
+    def render(self, values):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_label_text(key + (("le", bound),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_text(key)} {counts[-1]}')
+            lines.append(f'{self.name}_count{_label_text(key)} {cumulative}')
+        return lines
+
+class Gauge:
+    """A value read from a callback; across workers, the sum of the live workers' values."""
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        _metrics.append(self)
+
+    def values(self):
+        return {(): self.callback()}
+
+    def merge(self, total, values):
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, values):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge',
+                f'{self.name} {values.get((), 0)}']
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status.')
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency by route.')
+UPLOAD_SIZE = Histogram('upload_size_bytes', 'Size of uploaded recordings by route.', SIZE_BUCKETS)
+ANALYSIS_STAGES = Histogram('analysis_stage_duration_seconds', 'Time spent in each stage of scoring a recording.')
+ANALYSIS_ERRORS = Counter('analysis_errors_total', 'Recordings that failed to score, by exception type.')
+
+def _queue_depth():
+    import analysis_pool
+    return analysis_pool.queue_depth()
+
+Gauge('analysis_queue_depth', 'Analyses queued or running in this web worker.', _queue_depth)
+
+def observe_upload(size, route):
+    if METRICS_ENABLED:
+        UPLOAD_SIZE.observe(size, route=route)
+
+def record_analysis(result):
+    """Record the stage timings a scoring job returned, removing them from its result."""
+    timings = result.pop('timings', None) if isinstance(result, dict) else None
+    if METRICS_ENABLED and timings:
+        for stage, seconds in timings.items():
+            ANALYSIS_STAGES.observe(seconds, stage=stage)
+    return result
+
+def record_analysis_error(error):
+    if METRICS_ENABLED:
+        ANALYSIS_ERRORS.inc(error=type(error).__name__)
+
+def _snapshot():
+    """This process's values of every metric, keyed by metric name."""
+    with _lock:
+        return {metric.name: metric.values() for metric in _metrics}
+
+def _write_values(path, values):
+    write_json(path, {name: [[list(map(list, key)), value] for key, value in entries.items()]
+                      for name, entries in values.items()})
+
+def _read_values(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {name: {tuple(map(tuple, key)): value for key, value in entries}
+            for name, entries in data.items()}
+
+def flush():
+    """Write this process's values to METRICS_DIR if they changed since the last write."""
+    global _last_flushed
+    if not METRICS_DIR or _flush_pid != os.getpid():
+        return
+    values = _snapshot()
+    with _flush_lock:
+        if values != _last_flushed:
+            _write_values(_flush_path, values)
+            _last_flushed = values
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"Error writing metrics: {str(e)}")
+
+def _ensure_flusher():
+    """Start writing this process's values to METRICS_DIR, once per process (and again after a fork)."""
+    global _flush_pid, _flush_path, _last_flushed
+    if not METRICS_DIR or _flush_pid == os.getpid():
+        return
+    with _flush_lock:
+        if _flush_pid == os.getpid():
+            return
+        # The file name is unique to this process even if its pid is reused later
+        _flush_pid = os.getpid()
+        _flush_path = os.path.join(METRICS_DIR, f'{_flush_pid}-{uuid.uuid4().hex[:8]}.json')
+        _last_flushed = None
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+    atexit.register(flush)
+
+def _merged_values():
+    """The values of every process that wrote to METRICS_DIR, added up."""
+    totals = {metric.name: {} for metric in _metrics}
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        try:
+            values = _read_values(path)
+        except (OSError, ValueError):
+            continue
+        for metric in _metrics:
+            metric.merge(totals[metric.name], values.get(metric.name, {}))
+    return totals
+
+def clear_shared_metrics():
+    """Delete the files of a previous run. Call from the gunicorn master before workers start."""
+    if METRICS_DIR:
+        for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+            os.unlink(path)
+
+def mark_process_dead(pid):
+    """Drop a dead worker's gauges; its counters and histograms keep counting towards the totals."""
+    if not METRICS_DIR:
+        return
+    gauges = [metric.name for metric in _metrics if isinstance(metric, Gauge)]
+    for path in glob.glob(os.path.join(METRICS_DIR, f'{pid}-*.json')):
+        try:
+            values = _read_values(path)
+        except (OSError, ValueError):
+            continue
+        for name in gauges:
+            values.pop(name, None)
+        _write_values(path, values)
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    if METRICS_DIR:
+        # Make this worker's latest values visible, then add up every worker's
+        _ensure_flusher()
+        flush()
+        values = _merged_values()
+    else:
+        values = _snapshot()
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render(values[metric.name]))
+    return '\n'.join(lines) + '\n'
+
+def init_app(app):
+    """Count and time every request and serve /metrics, unless metrics are disabled."""
+    if not METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if start is not None:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, route=route)
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
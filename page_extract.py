@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from atomic_files import write_json
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+BASE_URL = 'https://ocr.org'
+
+# Known animal pages with their display names
+ANIMAL_PAGES = {
+    '/sound-library/right-whale/': 'Right Whale',
+    '/sound-library/orca/': 'Orca',
+    '/sound-library/cuviers-beaked-whale/': 'Cuvier\'s Beaked Whale',
+    '/sound-library/leopard-seal/': 'Leopard Seal',
+    '/sound-library/manatee/': 'Manatee',
+    '/sound-library/dolphin/': 'Dolphin',
+    '/sound-library/humpback-whale/': 'Humpback Whale',
+    '/sound-library/gray-whale/': 'Gray Whale',
+    '/sound-library/bowhead-whale/': 'Bowhead Whale',
+    '/sound-library/weddell-seal/': 'Weddell Seal',
+    '/sound-library/sperm-whale/': 'Sperm Whale',
+    '/sound-library/minke-whale/': 'Minke Whale',
+    '/sound-library/ringed-seal/': 'Ringed Seal',
+    '/sound-library/belugas/': 'Beluga',
+    '/sound-library/rissos-dolphin/': 'Risso\'s Dolphin',
+    '/sound-library/harbor-seal/': 'Harbor Seal',
+    '/sound-library/pilot-whale/': 'Pilot Whale',
+    '/sound-library/walrus/': 'Walrus'
+}
+
+# Parsed pages are reused for this long before the page is fetched again
+PAGE_CACHE_DIR = Path('cache/pages')
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 24 * 60 * 60))
+
+CONTENT_SELECTORS = [
+    ('article', {}),
+    ('div', {'class': 'post'}),
+    ('div', {'class': 'entry'}),
+    ('div', {'class': 'content-area'}),
+    ('div', {'class': 'entry-content'})
+]
+
+IMAGE_SELECTORS = [
+    ('img', {'class': 'wp-post-image'}),
+    ('img', {'class': 'featured-image'}),
+    ('img', {'class': 'attachment-post-thumbnail'}),
+    ('img', {'class': 'size-medium'}),
+    ('img', {})
+]
+
+AUDIO_LINK_RE = re.compile(r'\.(mp3|wav|m4a|ogg|mp4)$')
+AUDIO_URL_RE = re.compile(r'https?://[^\s<>"\']+?\.(?:mp3|wav|m4a|ogg|mp4)[^\s<>"\']*')
+
+def _unique(urls):
+    return list(dict.fromkeys(urls))
+
+def extract_media(html, page_url):
+    """Pull audio and image URLs out of an animal page.
+
+    Returns {'content': bool, 'audio': [...], 'images': [...]} with absolute URLs
+    in order of preference.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    content = None
+    for tag, attrs in CONTENT_SELECTORS:
+        content = soup.find(tag, attrs)
+        if content:
+            break
+    if not content:
+        return {'content': False, 'audio': [], 'images': []}
+
+    # Audio/source elements (including video sources), then direct links to audio files
+    audio = []
+    for element in content.find_all(['audio', 'source']) + content.find_all('a', href=AUDIO_LINK_RE):
+        for attr in ['src', 'href', 'data-src']:
+            if element.get(attr):
+                audio.append(urljoin(page_url, element[attr]))
+                break
+    if not audio:
+        # Players often keep the file URL in inline JSON or data attributes
+        audio = AUDIO_URL_RE.findall(html)
+
+    images = []
+    for tag, attrs in IMAGE_SELECTORS:
+        for img in content.find_all(tag, attrs):
+            src = img.get('src')
+            if src and any(ext in src.lower() for ext in ['.jpg', '.jpeg', '.png']):
+                images.append(urljoin(page_url, src))
+
+    return {'content': True, 'audio': _unique(audio), 'images': _unique(images)}
+
+def is_dynamic(media):
+    """A page needs a browser if the static HTML had no content or no media at all."""
+    return not media['content'] or not (media['audio'] or media['images'])
+
+def _cache_path(url):
+    return PAGE_CACHE_DIR / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]}.json"
+
+def _load_cached(url):
+    try:
+        with open(_cache_path(url)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('url') != url or time.time() - cached.get('fetched_at', 0) > PAGE_CACHE_TTL:
+        return None
+    return cached['media']
+
+def _save_cached(url, media):
+    write_json(_cache_path(url), {'url': url, 'fetched_at': time.time(), 'media': media})
+
+def render_page(url, wait_seconds=30):
+    """Load a page in headless Chrome and return its rendered HTML.
+
+    Needs the optional browser dependencies (requirements-browser.txt).
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    chrome_options = Options()
+    chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    try:
+        driver.get(url)
+        WebDriverWait(driver, wait_seconds).until(EC.presence_of_element_located((By.TAG_NAME, 'article')))
+        return driver.execute_script("return document.documentElement.outerHTML;")
+    finally:
+        driver.quit()
+
+def get_page_media(fetcher, url, use_browser=True, refresh=False):
+    """Return the media on a page, from the disk cache, static HTML or, if needed, a browser."""
+    if not refresh:
+        cached = _load_cached(url)
+        if cached is not None:
+            return cached
+
+    response = fetcher.get(url)
+    response.raise_for_status()
+    media = extract_media(response.text, url)
+
+    if is_dynamic(media) and use_browser:
+        print(f"No media in static HTML for {url}, rendering it in a browser")
+        try:
+            media = extract_media(render_page(url), url)
+        except ImportError:
+            print("Install requirements-browser.txt to render dynamic pages")
+        except Exception as e:
+            print(f"Error rendering {url}: {str(e)}")
+
+    if not is_dynamic(media):
+        _save_cached(url, media)
+    return media
+
+def extract_links(fetcher, pages, kind, use_browser=True, refresh=False):
+    """Fetch (path, display name) pages in parallel and yield (display name, urls) for each.
+
+    kind is 'audio' or 'images'. Pages that fail or have no content are reported and skipped.
+    """
+    def extract(page):
+        try:
+            return get_page_media(fetcher, urljoin(BASE_URL, page[0]), use_browser=use_browser, refresh=refresh)
+        except Exception as e:
+            print(f"Error processing {page[1]}: {str(e)}")
+            return None
+
+    # Pages are fetched and parsed in parallel; the fetcher keeps requests polite
+    results = fetcher.map(extract, pages)
+    for (path, display_name), media in zip(pages, results):
+        if media is None:
+            continue
+        print(f"\nProcessing {display_name}...")
+        if not media['content']:
+            print(f"No content found for {display_name}")
+            continue
+        yield display_name, media[kind]
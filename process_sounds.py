@@ -1,43 +1,145 @@
+import argparse
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from pydub import AudioSegment
-import time
+from atomic_files import write_json
+from audio_processing import process_to_duration
+from media_manifest import MediaManifest, file_sha256
+from renditions import encode_renditions, rendition_path
 
-def process_sound_file(input_file, output_file, target_duration=5000):
+# Records the source fingerprint and parameters each output was built from
+MANIFEST_NAME = 'manifest.json'
+
+def process_sound_file(input_file, output_file, target_duration=5000, sample_rate=None, channels=None,
+                       normalize_dbfs=None, crossfade_ms=0):
     """Process a sound file to be exactly target_duration milliseconds long."""
     try:
-        # Load the audio file
-        audio = AudioSegment.from_file(input_file)
-        
-        # If the audio is shorter than the target duration, loop it
-        if len(audio) < target_duration:
-            repeats = target_duration // len(audio) + 1
-            audio = audio * repeats
-        
-        # Trim to the target duration
-        audio = audio[:target_duration]
-        
-        # Export as WAV
-        audio.export(output_file, format='wav')
+        # Loop/trim into a single output buffer and write it atomically
+        process_to_duration(
+            input_file, output_file,
+            duration_ms=target_duration,
+            sample_rate=sample_rate,
+            channels=channels,
+            normalize_dbfs=normalize_dbfs,
+            crossfade_ms=crossfade_ms
+        )
         print(f"Processed: {output_file.name}")
         return True
     except Exception as e:
         print(f"Error processing {input_file.name}: {str(e)}")
         return False
 
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Ignoring unreadable manifest {path}: {str(e)}")
+        return {}
+
+def save_manifest(path, manifest):
+    write_json(path, manifest, indent=2, sort_keys=True)
+
+def is_up_to_date(entry, source_file, output_file, params):
+    """Check whether output_file was already built from this source with these parameters."""
+    if not entry or not output_file.exists() or entry.get('params') != params:
+        return False
+    if not all(rendition_path(output_file, ext).exists() for ext in entry.get('renditions', [])):
+        return False
+    stat = source_file.stat()
+    if entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+        return True
+    # The file was touched; only the content decides
+    if entry.get('sha256') == file_sha256(source_file):
+        entry['mtime_ns'] = stat.st_mtime_ns
+        entry['size'] = stat.st_size
+        return True
+    return False
+
+def _process_job(input_file, output_file, params):
+    stat = input_file.stat()
+    ok = process_sound_file(
+        input_file, output_file,
+        target_duration=params['duration'],
+        sample_rate=params['sample_rate'],
+        channels=params['channels'],
+        normalize_dbfs=params['normalize_dbfs'],
+        crossfade_ms=params['crossfade_ms']
+    )
+    # Compressed copies for delivery, written next to the processed WAV
+    renditions = encode_renditions(output_file, force=True) if ok and params['renditions'] else []
+    return ok, {
+        'sha256': file_sha256(input_file),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'params': params,
+        'renditions': renditions
+    }
+
 def main():
+    parser = argparse.ArgumentParser(description='Loop and trim processed_*.wav sounds to a fixed length.')
+    parser.add_argument('--duration', type=int, default=5000, help='target duration in milliseconds')
+    parser.add_argument('--sample-rate', type=int, default=None, help='output sample rate (default: keep)')
+    parser.add_argument('--channels', type=int, default=None, help='output channel count (default: keep)')
+    parser.add_argument('--normalize', type=float, default=None, metavar='DBFS', help='normalize loudness to this RMS level')
+    parser.add_argument('--crossfade', type=int, default=0, metavar='MS', help='crossfade between loop repetitions')
+    parser.add_argument('--no-renditions', action='store_true', help="don't encode Opus/AAC/MP3 copies")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='parallel processes')
+    parser.add_argument('--force', action='store_true', help='rebuild every file')
+    args = parser.parse_args()
+
     sounds_dir = Path('static/sounds')
     processed_dir = sounds_dir / 'processed'
     processed_dir.mkdir(exist_ok=True)
-    
-    # Process all WAV files
-    for sound_file in sounds_dir.glob('*.wav'):
-        if sound_file.name.startswith('processed_'):
-            output_file = processed_dir / sound_file.name
-            process_sound_file(sound_file, output_file)
-            time.sleep(0.1)  # Small delay to prevent system overload
-    
-    print("\nSound processing complete!")
+    manifest_path = processed_dir / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    params = {
+        'duration': args.duration,
+        'sample_rate': args.sample_rate,
+        'channels': args.channels,
+        'normalize_dbfs': args.normalize,
+        'crossfade_ms': args.crossfade,
+        'renditions': not args.no_renditions
+    }
+
+    # Only sources that changed, or whose target parameters changed, are rebuilt
+    jobs = []
+    for sound_file in sorted(sounds_dir.glob('processed_*.wav')):
+        output_file = processed_dir / sound_file.name
+        if not args.force and is_up_to_date(manifest.get(sound_file.name), sound_file, output_file, params):
+            continue
+        jobs.append((sound_file, output_file))
+
+    print(f"{len(jobs)} sounds to process")
+    failed = 0
+    processed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(_process_job, sound_file, output_file, params): sound_file for sound_file, output_file in jobs}
+        for future in as_completed(futures):
+            sound_file = futures[future]
+            try:
+                ok, entry = future.result()
+            except Exception as e:
+                print(f"Error processing {sound_file.name}: {str(e)}")
+                ok = False
+            if ok:
+                manifest[sound_file.name] = entry
+                processed.append(futures[future])
+            else:
+                failed += 1
+
+    save_manifest(manifest_path, manifest)
+
+    # Record the processed copies alongside each species' ingested media
+    media = MediaManifest()
+    if media.exists and processed:
+        for sound_file in processed:
+            media.record_output(sound_file.stem[len('processed_'):], 'processed', processed_dir / sound_file.name)
+        media.save()
+    print(f"\nSound processing complete! {len(jobs) - failed} processed, {failed} failed.")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,127 @@
+import base64
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+RECORDINGS_DIR = 'recordings'
+DB_PATH = os.path.join(RECORDINGS_DIR, 'index.sqlite3')
+
+# Databases whose schema this process has already created
+_initialized = set()
+_init_lock = threading.Lock()
+
+def _create_schema(db_path):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        # WAL mode is stored in the database file, so it only needs setting once
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS recordings (
+                filename TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS recordings_created ON recordings (created DESC, filename DESC)')
+    finally:
+        conn.close()
+
+def connect(db_path=DB_PATH):
+    """Open the recordings index, creating the schema the first time this process opens it."""
+    if db_path not in _initialized:
+        with _init_lock:
+            if db_path not in _initialized:
+                _create_schema(db_path)
+                _initialized.add(db_path)
+    return sqlite3.connect(db_path, timeout=10)
+
+def add_recording(filename, size, created, db_path=DB_PATH):
+    """Insert or update the metadata for one recording."""
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO recordings (filename, size, created) VALUES (?, ?, ?)',
+                (filename, size, created)
+            )
+    finally:
+        conn.close()
+
+def encode_cursor(created, filename):
+    return base64.urlsafe_b64encode(f'{created!r}|{filename}'.encode('utf-8')).decode('ascii')
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor wasn't produced by encode_cursor."""
+
+def decode_cursor(cursor):
+    try:
+        created, filename = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        return float(created), filename
+    except ValueError:
+        # Covers bad base64 (binascii.Error), non-UTF-8 bytes and a missing separator or timestamp
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}')
+
+def list_recordings(limit=50, cursor=None, db_path=DB_PATH):
+    """Return one page of recordings, newest first, and the cursor for the next page."""
+    conn = connect(db_path)
+    try:
+        if cursor:
+            created, filename = decode_cursor(cursor)
+            rows = conn.execute(
+                'SELECT filename, size, created FROM recordings '
+                'WHERE (created, filename) < (?, ?) '
+                'ORDER BY created DESC, filename DESC LIMIT ?',
+                (created, filename, limit + 1)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                'SELECT filename, size, created FROM recordings '
+                'ORDER BY created DESC, filename DESC LIMIT ?',
+                (limit + 1,)
+            ).fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+
+    recordings = [{
+        'filename': filename,
+        'size': size,
+        'created': datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S')
+    } for filename, size, created in rows]
+    return recordings, next_cursor
+
+def backfill(recordings_dir=RECORDINGS_DIR, db_path=DB_PATH):
+    """Index every .wav file already present in the recordings directory."""
+    if not os.path.isdir(recordings_dir):
+        return 0
+
+    rows = []
+    for entry in os.scandir(recordings_dir):
+        if entry.is_file() and entry.name.endswith('.wav'):
+            stat = entry.stat()
+            rows.append((entry.name, stat.st_size, stat.st_ctime))
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO recordings (filename, size, created) VALUES (?, ?, ?)',
+                rows
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'backfill':
+        print("Usage: python recordings_index.py backfill")
+        sys.exit(1)
+    count = backfill()
+    print(f"Indexed {count} recordings in {DB_PATH}")
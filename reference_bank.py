@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+import threading
+import uuid
+from pathlib import Path
+import numpy as np
+from atomic_files import write_json
+from audio_decode import ANALYSIS_SR, decode_audio
+
+# All reference clips decoded once to mono float32 at ANALYSIS_SR and packed end to end.
+# The index maps each clip to its slice; workers memory-map the bank and share its pages.
+BANK_DIR = Path('cache')
+INDEX_PATH = BANK_DIR / 'reference_bank.json'
+BANK_DTYPE = np.float32
+BANK_VERSION = 1
+
+_bank = None
+_bank_lock = threading.Lock()
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def build_bank(sounds_dirs, index_path=INDEX_PATH):
+    """Decode every processed_*.wav in sounds_dirs into a new bank file and index."""
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    bank_file = index_path.with_name(f'reference_bank-{uuid.uuid4().hex[:12]}.f32')
+    tmp_file = bank_file.with_name(f'.{bank_file.name}.tmp')
+
+    clips = {}
+    offset = 0
+    with open(tmp_file, 'wb') as f:
+        for sounds_dir in sounds_dirs:
+            for sound_file in sorted(Path(sounds_dir).glob('processed_*.wav')):
+                try:
+                    y, sr = decode_audio(sound_file, sr=ANALYSIS_SR)
+                except Exception as e:
+                    print(f"Error adding {sound_file} to the reference bank: {str(e)}")
+                    continue
+                f.write(np.ascontiguousarray(y, dtype=BANK_DTYPE).tobytes())
+                clips[str(sound_file)] = {'offset': offset, 'length': len(y), 'sr': sr, 'stat': _stat_key(sound_file)}
+                offset += len(y)
+    os.replace(tmp_file, bank_file)
+
+    # Swapping the index publishes the new bank; open memory maps keep the old file alive
+    index = {'version': BANK_VERSION, 'bank': bank_file.name, 'dtype': np.dtype(BANK_DTYPE).str,
+             'samples': offset, 'clips': clips}
+    write_json(index_path, index, indent=2, sort_keys=True)
+
+    for old_file in index_path.parent.glob('reference_bank-*.f32'):
+        if old_file != bank_file:
+            old_file.unlink(missing_ok=True)
+    return len(clips)
+
+class ReferenceBank:
+    """Read-only view of a packed reference bank."""
+
+    def __init__(self, index_path=INDEX_PATH):
+        index_path = Path(index_path)
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get('version') != BANK_VERSION:
+            raise ValueError(f'Unsupported reference bank version {index.get("version")}')
+        self.clips = index['clips']
+        if index['samples']:
+            self.samples = np.memmap(index_path.with_name(index['bank']), dtype=np.dtype(index['dtype']),
+                                     mode='r', shape=(index['samples'],))
+        else:
+            self.samples = np.zeros(0, dtype=BANK_DTYPE)
+
+    def get(self, path):
+        """Return (samples, sr) for a clip as a zero-copy slice, or None if it isn't banked or changed."""
+        entry = self.clips.get(str(Path(path)))
+        if entry is None:
+            return None
+        try:
+            if _stat_key(path) != entry['stat']:
+                return None
+        except OSError:
+            return None
+        return self.samples[entry['offset']:entry['offset'] + entry['length']], entry['sr']
+
+def get_bank():
+    """Return the shared bank for this process, or None if none has been built."""
+    global _bank
+    with _bank_lock:
+        if _bank is None and INDEX_PATH.exists():
+            try:
+                _bank = ReferenceBank()
+            except Exception as e:
+                print(f"Error opening reference bank: {str(e)}")
+        return _bank
+
+def load_reference_audio(path, sr=ANALYSIS_SR):
+    """Return (samples, sr) for a reference clip, from the bank when it is current."""
+    bank = get_bank()
+    banked = bank.get(path) if bank is not None else None
+    if banked is not None and banked[1] == sr:
+        return banked
+    return decode_audio(path, sr=sr)
+
+if __name__ == '__main__':
+    directories = sys.argv[1:] or ['static/sounds', 'static/sounds/processed']
+    count = build_bank(directories)
+    print(f"Packed {count} reference sounds into {INDEX_PATH}")
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import os
+import sys
+from pathlib import Path
+import numpy as np
+from atomic_files import write_atomic
+from audio_decode import ANALYSIS_SR
+from reference_bank import load_reference_audio
+
+# On-disk cache of reference features, one .npz file per reference clip
+CACHE_DIR = Path('cache/reference_features')
+
+# Bump when extract_features changes so stale cache files are ignored
+FEATURE_VERSION = 3
+
+# STFT framing shared by every feature
+N_FFT = 2048
+HOP_LENGTH = 512
+BLOCK_FRAMES = 8
+_WINDOW = np.hanning(N_FFT + 1)[:-1].astype(np.float32)
+
+# Magnitude of a full-scale sine, so spectra are in dBFS
+_FULL_SCALE = _WINDOW.sum() / 2
+
+# Pitch search range in Hz, and the peak level (relative to the loudest frame) below
+# which a frame counts as unvoiced
+PITCH_FMIN = 150
+PITCH_FMAX = 4000
+PITCH_THRESHOLD = 0.1
+
+# Floor of the dBFS spectrum used for the onset envelope
+FLOOR_DB = -80
+
+# In-memory store: reference path -> (mtime_ns, size) when loaded, features dict
+_reference_features = {}
+
+def file_fingerprint(path):
+    """Return a cache key for a file built from its path, mtime and content hash."""
+    path = Path(path)
+    stat = path.stat()
+    content_hash = hashlib.sha256(path.read_bytes()).hexdigest()
+    key = f'{path.resolve()}:{stat.st_mtime_ns}:{content_hash}:{FEATURE_VERSION}:{ANALYSIS_SR}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+def _frame(y):
+    """Split a signal into centered, overlapping frames of N_FFT samples (a strided view)."""
+    y = np.pad(np.asarray(y, dtype=np.float32), N_FFT // 2)
+    if len(y) < N_FFT:
+        y = np.pad(y, (0, N_FFT - len(y)))
+    return np.lib.stride_tricks.sliding_window_view(y, N_FFT)[::HOP_LENGTH]
+
+def extract_features(y, sr):
+    """Compute the per-frame features used for scoring from a single STFT.
+
+    The STFT is taken BLOCK_FRAMES frames at a time and reduced to per-frame
+    values straight away, so only one small block of spectrum is alive at once.
+    """
+    frames = _frame(y)
+    n_frames = len(frames)
+    lo = max(int(PITCH_FMIN * N_FFT / sr), 1)
+    hi = min(int(PITCH_FMAX * N_FFT / sr) + 1, N_FFT // 2)
+
+    pitch = np.zeros(n_frames, dtype=np.float32)
+    peak_magnitude = np.zeros(n_frames, dtype=np.float32)
+    onset = np.zeros(n_frames, dtype=np.float32)
+    rms = np.zeros(n_frames, dtype=np.float32)
+    previous_db = None
+
+    for start in range(0, n_frames, BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES]
+        rows = np.arange(len(block))
+        spectrum = np.abs(np.fft.rfft(block * _WINDOW, axis=1)).astype(np.float32) / _FULL_SCALE
+
+        # Pitch: strongest spectral peak between PITCH_FMIN and PITCH_FMAX, refined
+        # with parabolic interpolation on the log magnitude
+        peak_bins = np.argmax(spectrum[:, lo:hi], axis=1) + lo
+        before, peak, after = (np.log(spectrum[rows, peak_bins + shift] + 1e-10) for shift in (-1, 0, 1))
+        curvature = before - 2 * peak + after
+        safe_curvature = np.where(curvature < 0, curvature, -1)
+        offset = np.where(curvature < 0, 0.5 * (before - after) / safe_curvature, 0)
+        pitch[start:start + len(block)] = (peak_bins + offset) * sr / N_FFT
+        peak_magnitude[start:start + len(block)] = spectrum[rows, peak_bins]
+
+        # Onset envelope: positive spectral flux of the dB spectrum, averaged over bins
+        spectrum_db = np.maximum(20 * np.log10(np.maximum(spectrum, 1e-10)), FLOOR_DB)
+        if previous_db is not None:
+            spectrum_db_prev = np.vstack([previous_db, spectrum_db[:-1]])
+        else:
+            spectrum_db_prev = np.vstack([spectrum_db[:1], spectrum_db[:-1]])
+        onset[start:start + len(block)] = np.maximum(spectrum_db - spectrum_db_prev, 0).mean(axis=1)
+        previous_db = spectrum_db[-1:]
+
+        # Energy: RMS of the same (unwindowed) frames
+        rms[start:start + len(block)] = np.sqrt(np.mean(np.square(block), axis=1))
+
+    # Frames too quiet to carry a pitch are left out of the mean through pitch_count
+    voiced = peak_magnitude > max(peak_magnitude.max(initial=0) * PITCH_THRESHOLD, 1e-6)
+    return {
+        'sr': sr,
+        'length': len(y),
+        'pitch_sum': np.where(voiced, pitch, 0).astype(np.float32),
+        'pitch_count': voiced.astype(np.int32),
+        'onset': onset,
+        'rms': rms
+    }
+
+def _cache_prefix(path):
+    path_hash = hashlib.sha256(str(Path(path).resolve()).encode('utf-8')).hexdigest()[:8]
+    return f'{Path(path).stem}-{path_hash}'
+
+def _cache_path(path):
+    return CACHE_DIR / f'{_cache_prefix(path)}-{file_fingerprint(path)}.npz'
+
+def _load_cached(cache_file):
+    with np.load(cache_file) as data:
+        features = {name: data[name] for name in data.files}
+    features['sr'] = int(features['sr'])
+    features['length'] = int(features['length'])
+    return features
+
+def compute_reference_features(path):
+    """Load features for a reference clip from the disk cache, computing them on a miss."""
+    cache_file = _cache_path(path)
+    if cache_file.exists():
+        try:
+            return _load_cached(cache_file)
+        except Exception as e:
+            print(f"Error reading feature cache {cache_file.name}: {str(e)}")
+
+    # Read the clip from the shared reference bank when it is current
+    y, sr = load_reference_audio(path, sr=ANALYSIS_SR)
+    features = extract_features(y, sr)
+
+    # Write atomically so concurrent workers and threads never see a partial file
+    buffer = io.BytesIO()
+    np.savez(buffer, **features)
+    write_atomic(cache_file, buffer.getvalue())
+
+    # Drop stale entries for the same clip
+    for old_file in CACHE_DIR.glob(f'{_cache_prefix(path)}-*.npz'):
+        if old_file != cache_file:
+            old_file.unlink(missing_ok=True)
+    return features
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def _store(path):
+    # Stat before computing, so a rewrite during the computation is caught next time
+    stat_key = _stat_key(path)
+    features = compute_reference_features(path)
+    _reference_features[str(Path(path))] = (stat_key, features)
+    return features
+
+def build_reference_store(sounds_dir='static/sounds/processed'):
+    """Load features for every processed reference clip into memory."""
+    sounds_dir = Path(sounds_dir)
+    if not sounds_dir.exists():
+        return 0
+
+    for sound_file in sorted(sounds_dir.glob('processed_*.wav')):
+        try:
+            _store(sound_file)
+        except Exception as e:
+            print(f"Error building reference features for {sound_file.name}: {str(e)}")
+    return len(_reference_features)
+
+def get_reference_features(path):
+    """Return features for a reference clip, from memory when the file hasn't changed since."""
+    cached = _reference_features.get(str(Path(path)))
+    if cached is not None and cached[0] == _stat_key(path):
+        return cached[1]
+    # New or rewritten (e.g. by process_sounds.py) since it was loaded
+    return _store(path)
+
+if __name__ == '__main__':
+    directories = sys.argv[1:] or ['static/sounds', 'static/sounds/processed']
+    for sounds_dir in directories:
+        # build_reference_store returns the size of the whole store, not just this directory
+        count = build_reference_store(sounds_dir)
+    print(f"Cached features for {count} reference sounds in {CACHE_DIR}")
@@ -0,0 +1,106 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Compressed renditions written next to each WAV, in order of preference:
+# extension -> (mimetype, ffmpeg codec arguments, soundfile format/subtype or None)
+RENDITIONS = {
+    'opus': ('audio/ogg', ['-c:a', 'libopus', '-b:a', '48k'], ('OGG', 'OPUS')),
+    'm4a': ('audio/mp4', ['-c:a', 'aac', '-b:a', '64k'], None),
+    'mp3': ('audio/mpeg', ['-c:a', 'libmp3lame', '-b:a', '64k'], ('MP3', 'MPEG_LAYER_III')),
+}
+
+RENDITIONS_DIRNAME = 'renditions'
+
+FFMPEG = shutil.which('ffmpeg')
+
+def rendition_path(wav_path, ext):
+    """Return where the given rendition of a WAV file lives."""
+    wav_path = Path(wav_path)
+    return wav_path.parent / RENDITIONS_DIRNAME / f'{wav_path.stem}.{ext}'
+
+def _encode(wav_path, output_file, ext):
+    mimetype, codec_args, soundfile_format = RENDITIONS[ext]
+    fd, tmp_path = tempfile.mkstemp(dir=output_file.parent, prefix='.encoding-', suffix=f'.{ext}')
+    os.close(fd)
+    try:
+        if FFMPEG:
+            cmd = [FFMPEG, '-nostdin', '-loglevel', 'error', '-y', '-i', str(wav_path)] + codec_args
+            cmd += ['-f', {'opus': 'ogg', 'm4a': 'mp4', 'mp3': 'mp3'}[ext], tmp_path]
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elif soundfile_format:
+            # Imported here so the web apps can serve renditions without loading the audio stack
+            import soundfile as sf
+            from audio_decode import resample
+            y, sr = sf.read(wav_path, dtype='float32', always_2d=True)
+            if ext == 'opus' and sr not in (8000, 12000, 16000, 24000, 48000):
+                y, sr = resample(y, sr, 48000), 48000
+            sf.write(tmp_path, y, sr, format=soundfile_format[0], subtype=soundfile_format[1])
+        else:
+            raise RuntimeError(f'ffmpeg is required to encode {ext}')
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+def encode_renditions(wav_path, force=False):
+    """Write the compressed renditions of a WAV file, returning the extensions available."""
+    wav_path = Path(wav_path)
+    (wav_path.parent / RENDITIONS_DIRNAME).mkdir(exist_ok=True)
+    available = []
+    for ext in RENDITIONS:
+        output_file = rendition_path(wav_path, ext)
+        if not force and output_file.exists() and output_file.stat().st_mtime >= wav_path.stat().st_mtime:
+            available.append(ext)
+            continue
+        try:
+            _encode(wav_path, output_file, ext)
+            available.append(ext)
+        except Exception as e:
+            print(f"Error encoding {output_file.name}: {str(e)}")
+    return available
+
+def available_formats(stem, rendition_files):
+    """List the rendition extensions present for stem, given the filenames in its renditions dir."""
+    return [ext for ext in RENDITIONS if f'{stem}.{ext}' in rendition_files]
+
+def choose_rendition(directory, filename, requested_format=None, accept_mimetypes=None):
+    """Pick the file to serve for a WAV request.
+
+    requested_format is an explicit client hint (e.g. ?format=opus). Otherwise the
+    first rendition whose mimetype the Accept header names explicitly wins; a bare
+    */* keeps the WAV, since it says nothing about what the client can decode.
+    Returns (relative filename, mimetype).
+    """
+    if not filename.endswith('.wav'):
+        return filename, None
+    stem = filename[:-len('.wav')]
+    rendition_dir = os.path.join(os.path.dirname(stem), RENDITIONS_DIRNAME)
+    base = os.path.basename(stem)
+
+    candidates = []
+    if requested_format in RENDITIONS:
+        candidates = [requested_format]
+    elif accept_mimetypes is not None:
+        candidates = [ext for ext, (mimetype, _, _) in RENDITIONS.items()
+                      if any(value == mimetype and quality > 0 for value, quality in accept_mimetypes)]
+
+    for ext in candidates:
+        relative = os.path.join(rendition_dir, f'{base}.{ext}')
+        if os.path.exists(os.path.join(directory, relative)):
+            return relative, RENDITIONS[ext][0]
+    return filename, 'audio/wav'
+
+def main():
+    directories = sys.argv[1:] or ['static/sounds', 'static/sounds/processed']
+    for directory in directories:
+        for wav_path in sorted(Path(directory).glob('processed_*.wav')):
+            formats = encode_renditions(wav_path)
+            print(f"{wav_path.name}: {', '.join(formats) or 'no renditions'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import time
+import numpy as np
+from audio_decode import ANALYSIS_SR, decode_audio, resample
+from reference_features import extract_features, get_reference_features
+
+def pitch_mean(features, n_frames):
+    """Mean pitch over the voiced frames among the first n_frames (0 if none are voiced)."""
+    count = features['pitch_count'][:n_frames].sum()
+    if count == 0:
+        return 0.0
+    return features['pitch_sum'][:n_frames].sum() / count
+
+def compare_features(original, user):
+    """Score user features against reference features, returning (score, feedback)."""
+    n_frames = min(len(original['onset']), len(user['onset']))
+
+    # Get mean pitch values (ignoring unvoiced frames)
+    original_pitch_mean = pitch_mean(original, n_frames)
+    user_pitch_mean = pitch_mean(user, n_frames)
+
+    # Calculate pitch similarity (much stricter scaling)
+    pitch_diff = abs(original_pitch_mean - user_pitch_mean)
+    pitch_score = max(0, 100 - (pitch_diff / 10))  # Much stricter scaling factor
+
+    # Calculate rhythm similarity (much stricter scaling)
+    rhythm_diff = np.mean(np.abs(original['onset'][:n_frames] - user['onset'][:n_frames]))
+    rhythm_score = max(0, 100 - (rhythm_diff * 20))  # Much stricter scaling factor
+
+    # Calculate energy similarity
+    energy_diff = np.mean(np.abs(original['rms'][:n_frames] - user['rms'][:n_frames]))
+    energy_score = max(0, 100 - (energy_diff * 30))  # Strict energy comparison
+
+    # Calculate final score (weighted combination)
+    final_score = (pitch_score * 0.5 + rhythm_score * 0.3 + energy_score * 0.2)
+
+    # Make scoring even stricter by applying a penalty for any significant differences
+    if pitch_diff > 20 or rhythm_diff > 0.5 or energy_diff > 0.3:
+        final_score *= 1  # 20% penalty for significant differences
+
+    # Generate feedback based on score
+    if final_score >= 90:
+        feedback = "Perfect! You're a marine animal sound expert! 🌟"
+    elif final_score >= 75:
+        feedback = "Very good! You're getting really close! 🎯"
+    elif final_score >= 50:
+        feedback = "Not bad! Keep practicing to match the sound better! 🎵"
+    else:
+        feedback = "Keep trying! Focus on matching the pitch and rhythm! 💪"
+
+    return final_score, feedback
+
+def score_audio(user_audio, reference_path):
+    """Score a user recording (path, bytes or file-like) against a reference clip.
+
+    The result carries per-stage 'timings' in seconds; metrics.record_analysis
+    removes them before the result is returned to the client.
+    """
+    timings = {}
+    original = get_reference_features(reference_path)
+
+    # Decode the upload once, straight to mono at the analysis rate references use, and
+    # only as much of it as the reference is long since the rest is never compared
+    user, sr = decode_audio(user_audio, sr=original['sr'], timings=timings,
+                            max_duration=original['length'] / original['sr'])
+
+    # Only the overlapping part of the two clips is compared
+    min_len = min(original['length'], len(user))
+    if min_len == 0:
+        raise ValueError('Recording contains no audio')
+    start = time.perf_counter()
+    user_features = extract_features(user[:min_len], sr)
+    timings['features'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    final_score, feedback = compare_features(original, user_features)
+    timings['scoring'] = time.perf_counter() - start
+    return {
+        'score': round(float(final_score), 1),
+        'feedback': feedback,
+        'timings': timings
+    }
+
+def warm_up(sr=ANALYSIS_SR):
+    """Run resampling and the feature pipeline once on a synthetic clip so first requests don't pay import and setup costs."""
+    t = np.arange(48000, dtype=np.float32) / 48000
+    y = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    extract_features(resample(y, 48000, sr), sr)
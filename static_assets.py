@@ -0,0 +1,99 @@
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from flask import request, send_file, send_from_directory
+from werkzeug.security import safe_join
+
+# Older Pythons don't know these image types
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+
+# Versioned URLs (?v=<content hash>) never change content, so browsers may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# path -> (mtime_ns, size, version)
+_versions = {}
+_versions_lock = threading.Lock()
+
+def asset_version(path):
+    """Return a short content hash for a file, recomputed only when it changes on disk."""
+    stat = os.stat(path)
+    cached = _versions.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    version = digest.hexdigest()[:16]
+    with _versions_lock:
+        _versions[path] = (stat.st_mtime_ns, stat.st_size, version)
+    return version
+
+def asset_url(url_prefix, directory, filename):
+    """Build a content-addressed URL for directory/filename, served under url_prefix."""
+    path = os.path.join(directory, filename)
+    try:
+        return f'{url_prefix}/{filename}?v={asset_version(path)}'
+    except OSError:
+        return f'{url_prefix}/{filename}'
+
+def send_asset(directory, filename, mimetype=None, versioned_name=None):
+    """Serve a static file with a content-hash ETag, conditional GET and byte ranges.
+
+    Requests whose ?v= matches the content hash of versioned_name (default: filename)
+    are marked immutable; anything else must revalidate, which is a 304 when unchanged.
+    """
+    path = safe_join(directory, filename)
+    etag = True
+    if path is not None and os.path.isfile(path):
+        etag = asset_version(path)
+
+    response = send_from_directory(directory, filename, mimetype=mimetype, etag=etag, conditional=True)
+
+    versioned_path = safe_join(directory, versioned_name or filename)
+    requested_version = request.args.get('v')
+    if requested_version and versioned_path is not None and os.path.isfile(versioned_path) \
+            and requested_version == asset_version(versioned_path):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+    # Let media players know they can seek with Range requests
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+# Precompressed variants tried in order of preference: (encoding, file suffix)
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')]
+
+def load_build_manifest(build_dir='build'):
+    """Return {page: content hash} for prebuilt pages, or {} if nothing was built."""
+    try:
+        with open(os.path.join(build_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def send_prebuilt(build_dir, name, version, mimetype='text/html'):
+    """Serve a prebuilt file, picking a precompressed variant the client accepts."""
+    path = os.path.join(build_dir, name)
+    encoding = None
+    for candidate, suffix in PRECOMPRESSED:
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+
+    # Each encoding is a different byte stream, so it gets its own ETag
+    etag = f'{version}-{encoding}' if encoding else version
+    response = send_file(os.path.abspath(path), mimetype=mimetype, etag=etag, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response
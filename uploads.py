@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Uploads are copied to disk in chunks of this size so memory use stays flat
+CHUNK_SIZE = 64 * 1024
+
+# Largest accepted upload, in bytes (overridable through the environment)
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+
+# Single background thread for writes that don't need to finish before the response
+_archive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='archive')
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+class IncompleteUpload(Exception):
+    """Raised when an upload ends before its declared length, e.g. the client disconnected."""
+
+def unique_filename(prefix, suffix):
+    """Return a timestamped filename that cannot collide with concurrent uploads."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f'{prefix}_{timestamp}_{uuid.uuid4().hex[:12]}{suffix}'
+
+def save_stream(stream, directory, filename, max_bytes=MAX_UPLOAD_BYTES, chunk_size=CHUNK_SIZE,
+                expected_bytes=None):
+    """Copy a readable stream to directory/filename atomically and return the bytes written.
+
+    Data is written to a temporary file in the same directory and renamed into place
+    once complete, so readers never see a partial file. If expected_bytes is given,
+    a stream that ends short of it is discarded.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.tmp')
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f'Upload exceeds {max_bytes} bytes')
+                f.write(chunk)
+        if expected_bytes is not None and size != expected_bytes:
+            raise IncompleteUpload(f'Upload ended after {size} of {expected_bytes} bytes')
+        os.replace(tmp_path, os.path.join(directory, filename))
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return size
+
+def _archive(data, directory, filename):
+    try:
+        save_stream(io.BytesIO(data), directory, filename, max_bytes=len(data))
+    except Exception as e:
+        print(f"Error archiving {filename}: {str(e)}")
+
+def archive_async(data, directory, filename):
+    """Write bytes to directory/filename in the background."""
+    return _archive_executor.submit(_archive, data, directory, filename)